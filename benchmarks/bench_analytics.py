@@ -0,0 +1,47 @@
+"""
+Benchmark glass_demand on a year of synthetic transactions of three bars.
+
+    python -m benchmarks.bench_analytics --rows 10000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.analytics import glass_demand
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--drinks", type=int, default=300)
+    parser.add_argument("--glasses", type=int, default=31)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    bars = ["Budapest", "London", "New York"]
+    glasses = [f"Glass {i}" for i in range(args.glasses)]
+    drinks = [f"Drink {i}" for i in range(args.drinks)]
+    cocktails = pd.DataFrame({"drink": drinks, "glass": [glasses[i % args.glasses] for i in range(args.drinks)]})
+    bar_stock = pd.DataFrame(
+        [(glass, int(rng.integers(1, 50)), bar) for bar in bars for glass in glasses],
+        columns=["glass_type", "stock", "bar"],
+    )
+    transactions = pd.DataFrame(
+        {
+            "location": pd.Categorical.from_codes(rng.integers(0, len(bars), args.rows), categories=bars),
+            "drink": pd.Categorical.from_codes(rng.integers(0, args.drinks, args.rows), categories=drinks),
+            "time": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, args.rows), unit="s"),
+        }
+    )
+
+    start = time.perf_counter()
+    demand = glass_demand(transactions, cocktails, bar_stock)
+    elapsed = time.perf_counter() - start
+    print(
+        f"glass_demand rows={args.rows} groups={len(demand)} seconds={elapsed:.3f} "
+        f"ns_per_row={elapsed / args.rows * 1e9:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
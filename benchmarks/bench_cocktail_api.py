@@ -0,0 +1,41 @@
+"""
+Benchmark get_cocktail_by_glass against the local stub API at several concurrency levels.
+
+    python -m benchmarks.bench_cocktail_api --latency 0.05 --concurrency 1 4 8 16
+"""
+import argparse
+import time
+from benchmarks.stub_api import StubCocktailAPI
+from utils.custom import get_cocktail_by_glass
+from utils.data_extractor import APIExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--glasses", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with StubCocktailAPI(latency=args.latency) as stub:
+        glass_list = list(stub.catalog)[: args.glasses]
+        parameters = {
+            "name": "drinks_api",
+            "request_obj": {"url": stub.url + "/filter.php?g={glass}"},
+            "data_field": "drinks",
+            "columns_mapping": {"strDrink": "drink"},
+            "drop_columns": ["strDrinkThumb", "idDrink"],
+        }
+        for workers in args.concurrency:
+            stub.connections.clear()
+            start = time.perf_counter()
+            df = get_cocktail_by_glass(parameters, glass_list, APIExtractor, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            print(
+                f"concurrency={workers:<3} rows={len(df):<6} seconds={elapsed:.3f} "
+                f"connections={len(stub.connections)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
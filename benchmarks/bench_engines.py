@@ -0,0 +1,56 @@
+"""
+Benchmark the CSV engines (pandas, pyarrow, polars) and dtype backends reading the
+three transaction sources of config.yaml, on the sample files or, with --rows, on
+synthetic files generated in --directory.
+
+    python -m benchmarks.bench_engines
+    python -m benchmarks.bench_engines --rows 2000000 --repeat 3
+"""
+import time
+import argparse
+from typing import Dict, List, Optional
+import yaml
+from benchmarks.generate_data import generate_dataset
+from benchmarks.stub_api import default_catalog
+from utils.csv_engines import ENGINES, read_csv
+
+
+def source_kwargs(config_path: str, paths: Optional[Dict[str, str]] = None) -> Dict[str, Dict]:
+    """Return the pandas_kwargs of every transaction source, reading the generated files when paths is given."""
+    with open(config_path, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    sources = {}
+    for source in config["CSV"]["transactions"]:
+        kwargs = dict(source["pandas_kwargs"])
+        if paths:
+            kwargs["filepath_or_buffer"] = paths[source["name"]]
+        sources[source["name"]] = kwargs
+    return sources
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--rows", type=int, default=None, help="rows of the synthetic files, default the sample files")
+    parser.add_argument("--directory", default=".cache/bench")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    paths = generate_dataset(args.directory, args.rows, default_catalog()) if args.rows else None
+    for name, kwargs in source_kwargs(args.config, paths).items():
+        for engine in args.engines:
+            for dtype_backend in ("numpy", "pyarrow"):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    df = read_csv(kwargs, engine=engine, dtype_backend=dtype_backend)
+                    timings.append(time.perf_counter() - start)
+                print(
+                    f"{name:<10} {engine:<8} {dtype_backend:<8} rows={len(df)} "
+                    f"best_seconds={min(timings):.3f} mb={df.memory_usage(deep=True).sum() / 2**20:.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
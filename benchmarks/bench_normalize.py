@@ -0,0 +1,38 @@
+"""
+Benchmark per row cost of normalizing low cardinality string columns, comparing the
+per cell DataFrame.map(str.title) with normalize_series on distinct values.
+
+    python -m benchmarks.bench_normalize --rows 1000000 --distinct 300
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.normalize import normalize_series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    values = np.array([f" drink number {i} " for i in range(args.distinct)], dtype=object)
+    df = pd.DataFrame({"drink": values[rng.integers(0, args.distinct, args.rows)]})
+
+    cases = {
+        "map(str.title)": lambda: df[["drink"]].map(str.title),
+        "normalize title": lambda: normalize_series(df["drink"], ["title"]),
+        "normalize strip,nfc,title": lambda: normalize_series(df["drink"], ["strip", "nfc", "title"]),
+        "normalize title (category)": lambda: normalize_series(df["drink"].astype("category"), ["title"]),
+    }
+    for name, func in cases.items():
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28} seconds={elapsed:.3f} ns_per_row={elapsed / args.rows * 1e9:.1f}")
+
+
+if __name__ == "__main__":
+    main()
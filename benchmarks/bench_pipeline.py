@@ -0,0 +1,194 @@
+"""
+Benchmark the pipeline steps on synthetic data of growing size: extract_and_validate of every
+transaction source and the bar stock, get_cocktail_by_glass against the local stub API and,
+when a database is given, load_to_stage of every staging table and every report table merge.
+
+The step measurements and the startup times of the command line (STARTUP_COMMANDS) are
+written to <output-dir>/<git version>.json, so the results of two versions can be compared
+with --baseline.
+
+    python -m benchmarks.bench_pipeline --rows 100000 1000000 --dsn postgresql://localhost/bench
+    python -m benchmarks.bench_pipeline --rows 100000 --baseline benchmarks/results/<version>.json
+
+The --dsn database is a scratch database: its report tables are created when missing and
+emptied before every run.
+"""
+import os
+import copy
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import create_engine, text
+import main as pipeline
+from benchmarks.generate_data import generate_dataset
+from benchmarks.stub_api import StubCocktailAPI, default_catalog
+from utils import sql
+from utils.custom import SourceCollector, bar_stock_schema, extract_and_validate, get_cocktail_by_glass
+from utils.custom import trainsaction_schema
+from utils.data_extractor import APIExtractor, CSVExtractor
+from utils.metrics import RunReport, measure, recording
+
+
+def git_version() -> str:
+    """Return the git description of the working tree, e.g. 7e7356b-dirty."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+STARTUP_COMMANDS = {
+    "cli --help": ["cli.py", "--help"],
+    "cli validate-config": ["cli.py", "validate-config"],
+    "import main": ["-c", "import main"],
+}
+
+
+def startup_times(repeat: int = 3) -> Dict[str, float]:
+    """Return the best wall time in seconds of every STARTUP_COMMANDS run in a fresh interpreter."""
+    times = {}
+    for name, command in STARTUP_COMMANDS.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, *command], capture_output=True, check=True)
+            best = min(best, time.perf_counter() - started)
+        times[name] = best
+    return times
+
+
+def benchmark_config(config: Dict, paths: Dict[str, str], api_url: str) -> Dict:
+    """Return a copy of the pipeline configuration reading the generated files and the stub API."""
+    config = copy.deepcopy(config)
+    for param in config["CSV"]["transactions"]:
+        param["pandas_kwargs"]["filepath_or_buffer"] = paths[param["name"]]
+    config["CSV"]["bar_stock"]["pandas_kwargs"]["filepath_or_buffer"] = paths["bar_stock"]
+    config["API"]["glass"]["request_obj"]["url"] = api_url + "/list.php?g=list"
+    config["API"]["cocktail"]["request_obj"]["url"] = api_url + "/filter.php?g={glass}"
+    return config
+
+
+def run_benchmark(config: Dict, engine=None) -> RunReport:
+    """Run and measure the pipeline steps with the given configuration."""
+    csv_config, api_config, db_config = config["CSV"], config["API"], config["DATABASE"]
+    report = RunReport()
+    with recording(report):
+        collector = SourceCollector(label_column="location")
+        for param in csv_config["transactions"]:
+            collector.add(param["name"], extract_and_validate(param, CSVExtractor, trainsaction_schema))
+        transaction_df = collector.combine()
+        stock_df = extract_and_validate(csv_config["bar_stock"], CSVExtractor, bar_stock_schema)
+        glass_df = extract_and_validate(api_config["glass"], APIExtractor)
+        with measure("extract", "get_cocktail_by_glass") as metrics:
+            cocktail_df = get_cocktail_by_glass(
+                api_config["cocktail"],
+                glass_df["glass"].unique().tolist(),
+                APIExtractor,
+                max_workers=api_config.get("concurrency", 1),
+            )
+            metrics.rows_out = len(cocktail_df)
+        if engine is None:
+            return report
+
+        sql.Base.metadata.create_all(engine, checkfirst=True)
+        report_merges = pipeline.report_merges(db_config)
+        report_tables = [report_table for report_table, _, _, _ in report_merges]
+        if set(report_tables) & set(pipeline.ROLLUPS):
+            report_tables.append(sql.RollupWatermark.__tablename__)
+        staged = {
+            db_config["transaction_table_stage"]: transaction_df,
+            db_config["stock_table_stage"]: stock_df,
+            db_config["glass_table_stage"]: glass_df,
+            db_config["cocktail_table_stage"]: cocktail_df,
+        }
+        with engine.connect() as connection:
+            connection.execute(text(f"TRUNCATE {', '.join(report_tables)} RESTART IDENTITY CASCADE"))
+            for table_name, df in staged.items():
+                pipeline.load_to_stage(df, connection, table_name, method=db_config.get("load_method", "copy"))
+            for report_table, query, temp_key, _ in report_merges:
+                pipeline.merge_report_table(report_table, query, db_config[temp_key], connection)
+    return report
+
+
+def print_comparison(runs: List[Dict], startup: Dict[str, float], baseline: Dict) -> None:
+    """Print the wall time of every step and the startup times against the baseline run with the same number of rows."""
+    baseline_runs = {run["rows"]: run for run in baseline["runs"]}
+    for run in runs:
+        if run["rows"] not in baseline_runs:
+            continue
+        previous = {(step["stage"], step["name"]): step for step in baseline_runs[run["rows"]]["stages"]}
+        print(f"rows={run['rows']} against {baseline['version']}")
+        for step in run["stages"]:
+            before = previous.get((step["stage"], step["name"]))
+            if before and before["wall_seconds"]:
+                ratio = step["wall_seconds"] / before["wall_seconds"]
+                print(f"  {step['stage']:<10} {step['name']:<24} {before['wall_seconds']:>9.3f}s -> "
+                      f"{step['wall_seconds']:>9.3f}s  x{ratio:.2f}")
+    for name, before in baseline.get("startup", {}).items():
+        if name in startup:
+            print(f"  startup    {name:<24} {before:>9.3f}s -> {startup[name]:>9.3f}s  x{startup[name] / before:.2f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000], help="transactions per source")
+    parser.add_argument("--config", default=pipeline.CONFIG_PATH)
+    parser.add_argument("--data-dir", default=".cache/bench")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--glasses", type=int, default=40)
+    parser.add_argument("--drinks-per-glass", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub API latency in seconds")
+    parser.add_argument("--dsn", help="scratch database to benchmark load_to_stage and the merges on")
+    parser.add_argument("--output-dir", default="benchmarks/results")
+    parser.add_argument("--baseline", help="results file of another version to compare with")
+    args = parser.parse_args(argv)
+
+    config = pipeline.load_config(args.config)
+    catalog = default_catalog(args.glasses, args.drinks_per_glass)
+    engine = create_engine(args.dsn) if args.dsn else None
+    runs = []
+    with StubCocktailAPI(catalog=catalog, latency=args.latency) as stub:
+        for rows in args.rows:
+            started = time.perf_counter()
+            paths = generate_dataset(args.data_dir, rows, catalog, chunk_rows=args.chunk_rows)
+            print(f"rows={rows} data generated in {time.perf_counter() - started:.1f}s")
+            report = run_benchmark(benchmark_config(config, paths, stub.url), engine)
+            result = report.to_dict()
+            runs.append({"rows": rows, "wall_seconds": result["wall_seconds"], "stages": result["stages"]})
+            for step in result["stages"]:
+                print(f"  {step['stage']:<10} {step['name']:<24} {step['wall_seconds']:>9.3f}s "
+                      f"cpu={step['cpu_seconds']:.3f}s rows_out={step['rows_out']} rss={step['peak_rss_mb']:.0f}MiB")
+
+    startup = startup_times()
+    for name, seconds in startup.items():
+        print(f"startup {name:<24} {seconds:>9.3f}s")
+
+    results = {
+        "version": git_version(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": engine.dialect.name if engine is not None else None,
+        "runs": runs,
+        "startup": startup,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{results['version']}.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2, default=str)
+    print(f"results written to {path}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            print_comparison(runs, startup, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
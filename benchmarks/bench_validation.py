@@ -0,0 +1,46 @@
+"""
+Benchmark per row cost of validating transactions with the pandera, fast and sample
+validation modes.
+
+    python -m benchmarks.bench_validation --rows 10000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.custom import trainsaction_schema
+from utils.validation import validate_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--distinct", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    drinks = pd.Categorical.from_codes(
+        rng.integers(0, args.distinct, args.rows), categories=[f"Drink {i}" for i in range(args.distinct)]
+    )
+    df = pd.DataFrame(
+        {
+            "time": pd.to_datetime(1_600_000_000 + rng.integers(0, 10**7, args.rows), unit="s"),
+            "drink": drinks,
+            "amount": rng.choice(np.array([4.0, 5.5, 11.0], dtype="float32"), args.rows),
+        }
+    )
+
+    cases = {
+        "pandera": lambda: validate_frame(df, trainsaction_schema, mode="pandera"),
+        "fast": lambda: validate_frame(df, trainsaction_schema, mode="fast"),
+        "sample 10000": lambda: validate_frame(df, trainsaction_schema, mode="sample", sample_size=10_000),
+    }
+    for name, func in cases.items():
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14} seconds={elapsed:.3f} ns_per_row={elapsed / args.rows * 1e9:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Generate synthetic transaction files in the dialect of every configured source and a
+matching bar stock file, written chunk by chunk so 10^8 row files fit in memory.
+
+    python -m benchmarks.generate_data --rows 1000000 --directory .cache/bench
+"""
+import os
+import argparse
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from benchmarks.stub_api import default_catalog
+
+# file layout of each transaction source, as read with the pandas_kwargs of config.yaml
+DIALECTS = {
+    "Budapest": {"columns": ["TS", "ital", "költség"], "header": True, "sep": ",", "date_format": "%Y-%m-%d %H:%M:%S"},
+    "London": {"columns": ["time", "drink", "amount"], "header": False, "sep": "\t", "date_format": "%Y-%m-%d %H:%M:%S"},
+    "New York": {"columns": ["time", "drink", "amount"], "header": True, "sep": ",", "date_format": "%m-%d-%Y %H:%M"},
+}
+
+AMOUNTS = np.array([4.0, 4.2, 5.5, 8.0, 11.0, 12.5])
+
+
+def transaction_path(directory: str, source: str, rows: int) -> str:
+    return os.path.join(directory, f"{source.lower().replace(' ', '_')}_{rows}.csv")
+
+
+def generate_transactions(
+    path: str,
+    source: str,
+    rows: int,
+    drinks: List[str],
+    chunk_rows: int = 1_000_000,
+    start: str = "2020-01-01",
+    end: str = "2020-12-31",
+    seed: int = 0,
+) -> str:
+    """
+    Write rows random transactions of the drinks to path in the dialect of source.
+
+    parameters
+    ----------
+    path : str
+        File to write, an existing file is overwritten.
+
+    source : str
+        Name of the transaction source (one of DIALECTS).
+
+    rows : int
+        Number of transactions.
+
+    drinks : List[str]
+        Drinks sampled for the transactions.
+
+    chunk_rows : int
+        Number of rows generated and written at a time.
+    """
+    dialect = DIALECTS[source]
+    rng = np.random.default_rng(seed)
+    first = pd.Timestamp(start).value // 10**9
+    span = pd.Timestamp(end).value // 10**9 - first
+    drink_values = np.asarray(drinks, dtype=object)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        for offset in range(0, rows, chunk_rows):
+            size = min(chunk_rows, rows - offset)
+            time = pd.to_datetime(first + rng.integers(0, span, size), unit="s")
+            chunk = pd.DataFrame(
+                {
+                    dialect["columns"][0]: time.strftime(dialect["date_format"]),
+                    dialect["columns"][1]: drink_values[rng.integers(0, len(drink_values), size)],
+                    dialect["columns"][2]: AMOUNTS[rng.integers(0, len(AMOUNTS), size)],
+                },
+                index=pd.RangeIndex(offset, offset + size),
+            )
+            chunk.to_csv(file, sep=dialect["sep"], header=dialect["header"] and offset == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def generate_bar_stock(path: str, glasses: List[str], seed: int = 0) -> str:
+    """Write the stock of every glass in every bar of DIALECTS to path."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        [(glass.lower(), int(rng.integers(1, 50)), bar.lower()) for bar in DIALECTS for glass in glasses],
+        columns=["glass_type", "stock", "bar"],
+    )
+    df.to_csv(path, index=False)
+    return path
+
+
+def generate_dataset(
+    directory: str, rows: int, catalog: Dict[str, List[str]], chunk_rows: int = 1_000_000, force: bool = False
+) -> Dict[str, str]:
+    """
+    Generate the transaction files of every source with rows transactions each and the
+    bar stock file in directory, reusing existing files unless force is set, and return
+    their paths keyed by source name (bar_stock for the stock file).
+    """
+    os.makedirs(directory, exist_ok=True)
+    drinks = sorted({drink for glass_drinks in catalog.values() for drink in glass_drinks})
+    paths = {}
+    for seed, source in enumerate(DIALECTS):
+        path = transaction_path(directory, source, rows)
+        if force or not os.path.exists(path):
+            generate_transactions(path, source, rows, drinks, chunk_rows=chunk_rows, seed=seed)
+        paths[source] = path
+    paths["bar_stock"] = generate_bar_stock(os.path.join(directory, "bar_data.csv"), list(catalog))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--directory", default=".cache/bench")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        for name, path in generate_dataset(
+            args.directory, rows, default_catalog(), chunk_rows=args.chunk_rows, force=args.force
+        ).items():
+            print(f"{name:<10} {path} {os.path.getsize(path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Local stub of the cocktail database API used to test and benchmark the API extractors
+without hitting thecocktaildb.com.
+
+    python -m benchmarks.stub_api --port 8000 --latency 0.05
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def default_catalog(glass_count: int = 40, drinks_per_glass: int = 10) -> Dict[str, List[str]]:
+    """Build a synthetic glass -> drinks catalog."""
+    return {
+        f"Glass {g}": [f"Drink {g}-{d}" for d in range(drinks_per_glass)]
+        for g in range(glass_count)
+    }
+
+
+class StubCocktailAPI:
+    """
+    Threaded HTTP server answering the list.php?g=list and filter.php?g=<glass>
+    endpoints of the cocktail database API from an in-memory catalog.
+
+    parameters
+    ----------
+    catalog : Optional[Dict[str, List[str]]]
+        Mapping of glass names to the drinks served in them.
+
+    latency : float
+        Seconds to sleep before answering every request, to mimic network latency.
+
+    port : int
+        Port to listen on (default is 0, pick a free port).
+    """
+
+    def __init__(self, catalog: Optional[Dict[str, List[str]]] = None, latency: float = 0.0, port: int = 0):
+        self.catalog = catalog if catalog is not None else default_catalog()
+        self.latency = latency
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    stub.connections.add(self.client_address)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                query = parse_qs(urlparse(self.path).query)
+                glass = query.get("g", [""])[0]
+                if glass == "list":
+                    drinks = [{"strGlass": name} for name in stub.catalog]
+                else:
+                    drinks = [
+                        {"strDrink": drink, "strDrinkThumb": "", "idDrink": str(i)}
+                        for i, drink in enumerate(stub.catalog.get(glass, []))
+                    ]
+                body = json.dumps({"drinks": drinks}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubCocktailAPI":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubCocktailAPI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    stub = StubCocktailAPI(latency=args.latency, port=args.port)
+    print(f"Serving stub cocktail API on {stub.url}")
+    stub.server.serve_forever()
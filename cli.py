@@ -0,0 +1,255 @@
+"""
+Command line entry point of the ETL pipeline.
+
+    python cli.py run                                   # extract, stage and merge every source
+    python cli.py run --source transactions --source bar_stock
+    python cli.py extract --source London               # extract and validate only, no database
+    python cli.py stage --source cocktails              # extract and load into the staging tables
+    python cli.py merge --source transactions           # merge the staging tables into the report tables
+    python cli.py validate-config
+    python cli.py dry-run --source glasses
+
+Sources are glasses, cocktails, bar_stock, transactions, date_dim or the name of a transaction
+source (e.g. London), which selects transactions restricted to the named sources.
+
+Only the standard library and yaml are imported at startup. The pipeline modules (pandas,
+pandera, SQLAlchemy, requests) are imported by the subcommands that need them.
+"""
+import os
+import sys
+import copy
+import time
+import argparse
+import logging
+from typing import Dict, List, Optional, Tuple, Any as AnyType
+import yaml
+
+CONFIG_PATH = "config.yaml"
+
+logger = logging.getLogger("ETL Pipeline")
+
+# kept in sync with main.SOURCES, utils.csv_engines and utils.validation, see test_cli
+SOURCES = ["glasses", "cocktails", "bar_stock", "transactions", "date_dim"]
+ENGINES = ("pandas", "pyarrow", "polars")
+DTYPE_BACKENDS = ("numpy", "pyarrow")
+VALIDATION_MODES = ("pandera", "fast", "sample")
+ON_ERROR = ("raise", "quarantine")
+DATABASE_KEYS = ["transaction_table_stage", "stock_table_stage", "glass_table_stage", "cocktail_table_stage"]
+DATABASE_ENVIRONMENT = ["PG_USER", "PG_PASSWORD", "PG_HOST", "PG_PORT", "PG_DATABASE"]
+
+
+def load_config(config_path: str) -> Dict[str, AnyType]:
+    """Load configuration from a YAML file."""
+    with open(config_path, "r", encoding="utf-8") as file:
+        return yaml.safe_load(file)
+
+
+def select_sources(config: Dict[str, AnyType], names: Optional[List[str]]) -> Tuple[Dict[str, AnyType], List[str]]:
+    """
+    Resolve the --source names into the selected SOURCES and a copy of config whose
+    transaction sources are restricted to the named ones, if any is named.
+
+    Returns
+    -------
+    config, sources: Tuple[Dict[str, AnyType], List[str]]
+        The configuration to run with and the selected sources, in pipeline order.
+    """
+    if not names:
+        return config, list(SOURCES)
+    transaction_names = [source["name"] for source in config["CSV"]["transactions"]]
+    selected, transactions = set(), []
+    for name in names:
+        if name in SOURCES:
+            selected.add(name)
+        elif name in transaction_names:
+            selected.add("transactions")
+            transactions.append(name)
+        else:
+            raise ValueError(f"Unknown source {name!r}, expected one of {SOURCES + transaction_names}")
+    if transactions and "transactions" not in names:
+        config = copy.deepcopy(config)
+        config["CSV"]["transactions"] = [
+            source for source in config["CSV"]["transactions"] if source["name"] in transactions
+        ]
+    return config, [source for source in SOURCES if source in selected]
+
+
+def _check_csv_source(source: Dict[str, AnyType], label: str, errors: List[str]) -> None:
+    if not isinstance(source, dict) or "name" not in source:
+        errors.append(f"{label}: name is required")
+        return
+    label = f"{label} {source['name']}"
+    path = source.get("pandas_kwargs", {}).get("filepath_or_buffer")
+    if not path:
+        errors.append(f"{label}: pandas_kwargs.filepath_or_buffer is required")
+    elif not os.path.isfile(path):
+        errors.append(f"{label}: file {path} does not exist")
+    if source.get("engine", "pandas") not in ENGINES:
+        errors.append(f"{label}: engine must be one of {ENGINES}")
+    if source.get("dtype_backend", "numpy") not in DTYPE_BACKENDS:
+        errors.append(f"{label}: dtype_backend must be one of {DTYPE_BACKENDS}")
+    validation = source.get("validation") or {}
+    if validation.get("mode", "pandera") not in VALIDATION_MODES:
+        errors.append(f"{label}: validation.mode must be one of {VALIDATION_MODES}")
+    if validation.get("on_error", "raise") not in ON_ERROR:
+        errors.append(f"{label}: validation.on_error must be one of {ON_ERROR}")
+
+
+def config_errors(config: AnyType) -> List[str]:
+    """Return the problems found in a configuration, without importing the pipeline or reading the data."""
+    if not isinstance(config, dict):
+        return ["the configuration must be a mapping"]
+    errors = [f"section {section} is missing" for section in ("CSV", "API", "DATABASE") if section not in config]
+    if errors:
+        return errors
+    errors += [f"DATABASE.{key} is required" for key in DATABASE_KEYS if not config["DATABASE"].get(key)]
+    if config["DATABASE"].get("single_transaction_merge") and config["DATABASE"].get("key_cache"):
+        errors.append("DATABASE.key_cache can not be used with single_transaction_merge, turn one of them off")
+    for source in ("glass", "cocktail"):
+        if not (config["API"].get(source) or {}).get("request_obj", {}).get("url"):
+            errors.append(f"API.{source}.request_obj.url is required")
+    transactions = config["CSV"].get("transactions") or []
+    if not transactions:
+        errors.append("CSV.transactions needs at least one source")
+    for source in transactions:
+        _check_csv_source(source, "CSV.transactions", errors)
+    names = [source.get("name") for source in transactions if isinstance(source, dict)]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    errors += [f"CSV.transactions: duplicate source {name}" for name in duplicates]
+    errors += [f"CSV.transactions: source name {name} is reserved" for name in names if name in SOURCES]
+    if "bar_stock" not in config["CSV"]:
+        errors.append("CSV.bar_stock is required")
+    else:
+        _check_csv_source(config["CSV"]["bar_stock"], "CSV.bar_stock", errors)
+    return errors
+
+
+def validate_config(args: argparse.Namespace) -> int:
+    config = load_config(args.config)
+    errors = config_errors(config)
+    for error in errors:
+        print(f"error: {error}")
+    missing = [name for name in DATABASE_ENVIRONMENT if name not in os.environ]
+    if missing:
+        print(f"warning: {', '.join(missing)} not set, the database subcommands will fail")
+    if not errors:
+        print(f"{args.config} is valid")
+    return 1 if errors else 0
+
+
+def dry_run(args: argparse.Namespace) -> int:
+    """Print the sources and the tasks a run would execute, without touching the data, the API or the database."""
+    if validate_config(args):
+        return 1
+    import main as pipeline  # pylint: disable=import-outside-toplevel
+
+    config, sources = select_sources(load_config(args.config), args.source)
+    for source in config["CSV"]["transactions"] if "transactions" in sources else []:
+        path = source["pandas_kwargs"]["filepath_or_buffer"]
+        print(f"transactions {source['name']}: {path} ({os.path.getsize(path)} bytes, "
+              f"engine {source.get('engine', 'pandas')})")
+
+    def no_connection():
+        raise RuntimeError("dry-run does not connect to the database")
+
+    tasks = pipeline.build_tasks(
+        config["DATABASE"], config["API"], config["CSV"], no_connection, sources=sources, phases=args.phases
+    )
+    names = {task.name for task in tasks}
+    for task in tasks:
+        depends_on = [name for name in task.depends_on if name in names]
+        print(f"task {task.name}" + (f" after {', '.join(depends_on)}" if depends_on else ""))
+    return 0
+
+
+def extract(args: argparse.Namespace) -> int:
+    """Extract and validate the selected sources without loading them, printing their row counts."""
+    # pylint: disable=import-outside-toplevel
+    import main as pipeline
+    from utils.custom import extract_and_validate, get_cocktail_by_glass, trainsaction_schema, bar_stock_schema
+    from utils.data_extractor import APIExtractor, CSVExtractor, ResponseCache
+    from utils.quarantine import Quarantine, quarantining
+
+    config, sources = select_sources(load_config(args.config), args.source)
+    csv_config, api_config = config["CSV"], config["API"]
+    quarantine = Quarantine()
+    with quarantining(quarantine):
+        # the caches create their directory, so they are only created for the sources using them
+        if "glasses" in sources or "cocktails" in sources:
+            cache = ResponseCache(**api_config["cache"]) if api_config.get("cache") else None
+            glass_df = pipeline.extract_glasses(api_config, cache)
+            print(f"glasses: {len(glass_df)} rows")
+            if "cocktails" in sources:
+                cocktail_df = get_cocktail_by_glass(
+                    dict(api_config["cocktail"], cache=cache),
+                    glass_df["glass"].unique().tolist(),
+                    APIExtractor,
+                    max_workers=api_config.get("concurrency", 1),
+                )
+                print(f"cocktails: {len(cocktail_df)} rows")
+        if "bar_stock" in sources or "transactions" in sources:
+            staging_cache = pipeline.create_staging_cache(csv_config.get("staging_cache"))
+        if "bar_stock" in sources:
+            stock_df = extract_and_validate(csv_config["bar_stock"], CSVExtractor, bar_stock_schema, staging_cache)
+            print(f"bar_stock: {len(stock_df)} rows")
+        for source in csv_config["transactions"] if "transactions" in sources else []:
+            df = extract_and_validate(source, CSVExtractor, trainsaction_schema, staging_cache)
+            print(f"transactions {source['name']}: {len(df)} rows")
+    if len(quarantine):
+        print(f"{len(quarantine)} validation failures")
+        quarantine_config = (config.get("PIPELINE") or {}).get("quarantine") or {}
+        if quarantine_config.get("directory"):
+            quarantine.write_csv(quarantine_config["directory"])
+    return 0
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run the phases of the pipeline for the selected sources."""
+    import main as pipeline  # pylint: disable=import-outside-toplevel
+
+    config, sources = select_sources(load_config(args.config), args.source)
+    return 0 if pipeline.main(config, sources, args.phases) else 1
+
+
+COMMANDS = {
+    "run": (run, ("stage", "merge"), "extract, stage and merge the sources"),
+    "extract": (extract, (), "extract and validate the sources without loading them"),
+    "stage": (run, ("stage",), "extract the sources and load them into the staging tables"),
+    "merge": (run, ("merge",), "merge the staging tables of the sources into the report tables"),
+    "validate-config": (validate_config, (), "check the configuration file"),
+    "dry-run": (dry_run, ("stage", "merge"), "print the tasks a run would execute"),
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (func, phases, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.set_defaults(func=func, phases=phases)
+        if name != "validate-config":
+            subparser.add_argument(
+                "--source", action="append", help="source to process, may be repeated (default all)"
+            )
+    return parser.parse_args(argv)
+
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.command not in ("validate-config", "dry-run"):
+        from utils.custom import custom_logger  # pylint: disable=import-outside-toplevel
+
+        custom_logger(name="ETL Pipeline")
+    started = time.perf_counter()
+    try:
+        status = args.func(args)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    logger.info("%s finished in %.2fs", args.command, time.perf_counter() - started)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -1,15 +1,29 @@
+import io
 import os
+import time
+import threading
+import logging
+from functools import partial
+from contextlib import contextmanager, nullcontext
 import yaml
-import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import MetaData, create_engine, inspect, text
 from utils import sql
 from utils.custom import custom_logger
-from utils.data_extractor import APIExtractor, CSVExtractor
+from utils.data_extractor import APIExtractor, CSVExtractor, ResponseCache
+from utils.state import SourceStateStore, file_fingerprint, frame_fingerprint
+from utils.scheduler import Task, run_tasks
+from utils.metrics import RunReport, measure, recording
+from utils.quarantine import Quarantine, quarantining
+from utils.staging_cache import StagingCache
+from utils.dimensions import DimensionKeyCache, key_transactions
 from utils.custom import trainsaction_schema, bar_stock_schema
-from utils.custom import get_cocktail_by_glass, extract_and_validate, generate_date_dim
+from utils.custom import get_cocktail_by_glass, extract_and_validate, generate_date_dim, missing_date_ranges
+from utils.custom import extract_and_validate_chunks, extract_sources, SourceCollector
 
 CONFIG_PATH = "config.yaml"
 
+logger = logging.getLogger("ETL Pipeline")
+
 
 def load_config(config_path):
     """Load configuration from a YAML file."""
@@ -27,109 +41,695 @@ def create_db_connection():
     return create_engine(f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}")
 
 
-def load_to_stage(dataframe, connection, table_name):
-    """Load a DataFrame into a database staging table."""
+def copy_to_stage(dataframe, connection, table_name, if_exists="replace", unlogged=False):
+    """Bulk load a DataFrame into a Postgres staging table with COPY FROM STDIN.
+
+    The staging table is created from the DataFrame columns when it does not
+    exist (or on replace, when it no longer matches them) and is truncated
+    instead of dropped on replace, then the rows are streamed from an
+    in-memory CSV buffer. With unlogged, the empty table is made UNLOGGED
+    before the rows are loaded, so they are not written to the WAL.
+    """
+    transaction = nullcontext() if connection.in_transaction() else connection.begin()
+    with transaction:
+        inspector = inspect(connection)
+        if inspector.has_table(table_name):
+            existing_columns = {column["name"] for column in inspector.get_columns(table_name)}
+        else:
+            existing_columns = set()
+        created = not existing_columns or (
+            if_exists == "replace" and not set(map(str, dataframe.columns)) <= existing_columns
+        )
+        if created:
+            dataframe.head(0).to_sql(name=table_name, con=connection, if_exists="replace", index=False)
+        elif if_exists == "replace":
+            connection.execute(text(f'TRUNCATE TABLE "{table_name}"'))
+        if unlogged and (created or if_exists == "replace"):
+            # a no-op when the table is already unlogged, otherwise a rewrite of the empty table
+            connection.execute(text(sql.set_unlogged.format(table=table_name)))
+
+        buffer = io.StringIO()
+        dataframe.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        columns = ", ".join(f'"{column}"' for column in dataframe.columns)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(f'COPY "{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        finally:
+            cursor.close()
+
+
+def load_to_stage(dataframe, connection, table_name, if_exists="replace", method="copy", unlogged=False):
+    """Load a DataFrame into a database staging table.
+
+    Postgres connections use the COPY bulk loader unless method is "to_sql",
+    other engines always fall back to DataFrame.to_sql. With unlogged, Postgres
+    staging tables are created (or turned) UNLOGGED when they are replaced.
+    """
     if not dataframe.empty:
         logger.info("Loading data into %s", table_name)
-        dataframe.to_sql(name=table_name, con=connection, if_exists="replace", index=False)
+        with measure("stage_load", table_name) as metrics:
+            metrics.rows_in = len(dataframe)
+            postgres = connection.dialect.name == "postgresql"
+            if method == "copy" and postgres:
+                copy_to_stage(dataframe, connection, table_name, if_exists=if_exists, unlogged=unlogged)
+            else:
+                if unlogged and postgres and if_exists == "replace":
+                    dataframe.head(0).to_sql(name=table_name, con=connection, if_exists="replace", index=False)
+                    connection.execute(text(sql.set_unlogged.format(table=table_name)))
+                    if_exists = "append"
+                dataframe.to_sql(name=table_name, con=connection, if_exists=if_exists, index=False)
+            metrics.rows_out = len(dataframe)
         logger.info("Loading data into %s completed", table_name)
 
 
+def load_chunks_to_stage(chunks, connection, table_name, method="copy", unlogged=False):
+    """Load an iterable of DataFrame chunks into a database staging table.
+
+    The first non-empty chunk replaces the staging table and the following
+    chunks are appended to it, so only one chunk is held in memory at a time.
+    """
+    if_exists = "replace"
+    rows = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        load_to_stage(chunk, connection, table_name, if_exists=if_exists, method=method, unlogged=unlogged)
+        if_exists = "append"
+        rows += len(chunk)
+    logger.info("Streamed %s rows into %s", rows, table_name)
+    return rows
+
+
+def stage_options(db_config):
+    """Return the load_to_stage options configured for the staging tables."""
+    return {"method": db_config.get("load_method", "copy"), "unlogged": db_config.get("unlogged_staging", False)}
+
+
+@contextmanager
+def staging_indexes(connection, db_config, temp_key):
+    """Drop the indexes of a staging table while it is bulk loaded, then create them and refresh its statistics.
+
+    The staging columns joined by the merges (sql.STAGING_INDEXES) are only
+    indexed on Postgres and unless the index_staging option is false. Postgres
+    staging tables are analyzed after every load, as autovacuum may not have
+    analyzed them before the merges read them.
+    """
+    table_name = db_config[temp_key]
+    if connection.dialect.name != "postgresql":
+        yield
+        return
+    indexed_columns = sql.STAGING_INDEXES.get(temp_key, []) if db_config.get("index_staging", True) else []
+    index_names = {columns: f"ix_{table_name}_{'_'.join(columns)}" for columns in indexed_columns}
+    for index in index_names.values():
+        connection.execute(text(sql.drop_staging_index.format(index=index)))
+    yield
+    inspector = inspect(connection)
+    if not inspector.has_table(table_name):
+        return
+    table_columns = {column["name"] for column in inspector.get_columns(table_name)}
+    # ANALYZE is not autocommitted by SQLAlchemy, its statistics would be rolled back with the connection
+    transaction = nullcontext() if connection.in_transaction() else connection.begin()
+    with transaction:
+        for columns, index in index_names.items():
+            if not set(columns) <= table_columns:
+                continue  # e.g. the names replaced with ids by the key cache
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            connection.execute(
+                text(sql.create_staging_index.format(index=index, table=table_name, columns=column_list))
+            )
+        connection.execute(text(sql.analyze_table.format(table=table_name)))
+
+
+def pending_transaction_sources(transaction_config, state=None, incremental=False, skip_unchanged=False):
+    """Return the transaction sources to extract.
+
+    When running incrementally, sources whose file size and modification time
+    are unchanged since the last run are skipped and the others only keep rows
+    newer than their watermark; append_only sources only parse the bytes appended
+    since the last run. When skipping unchanged sources, sources whose
+    file content fingerprint matches the last run are skipped.
+    """
+    if state is None:
+        return transaction_config
+    sources = []
+    for param in transaction_config:
+        name = param["name"]
+        path = param["pandas_kwargs"]["filepath_or_buffer"]
+        if incremental and not state.file_changed(name, path):
+            state.skip(name)
+            continue
+        if skip_unchanged and state.unchanged(name, file_fingerprint(path)):
+            continue
+        if incremental:
+            param = dict(param, watermark_column="time", watermark=state.watermark(name))
+            if param.get("append_only"):
+                param["byte_offset"] = state.file_size(name)
+        sources.append(param)
+    return sources
+
+
+def record_durations(state, sources, seconds):
+    """Split the duration of a stage over its file sources by file size and stage it in the state."""
+    if state is None or not sources:
+        return
+    sizes = {param["name"]: os.path.getsize(param["pandas_kwargs"]["filepath_or_buffer"]) for param in sources}
+    total = sum(sizes.values()) or 1
+    for name, size in sizes.items():
+        state.update(name, duration=seconds * size / total)
+
+
+def stream_transactions(transaction_config, state=None):
+    """Yield validated transaction chunks, tagged with their location, source by source."""
+    for param in transaction_config:
+        for chunk in extract_and_validate_chunks(
+            parameters=param, extract_func=CSVExtractor, schema=trainsaction_schema
+        ):
+            chunk["location"] = param["name"]
+            if state is not None:
+                state.advance_watermark(param["name"], chunk)
+            yield chunk
+
+
+def extend_date_dim(connection, date_table, start, end, method="python", load_method="copy"):
+    """Add the hours of the [start, end] range missing from the date dimension table.
+
+    The missing hours are generated in Python with generate_date_dim and
+    appended, or populated server side with generate_series when method is "sql".
+    """
+    sql.Date.__table__.to_metadata(MetaData(), name=date_table).create(connection, checkfirst=True)
+    existing_min, existing_max = connection.execute(text(sql.select_date_range.format(date_table=date_table))).one()
+    ranges = missing_date_ranges(start, end, existing_min, existing_max)
+    if not ranges:
+        logger.info("%s already covers %s to %s", date_table, start, end)
+    for lower, upper in ranges:
+        logger.info("Extending %s from %s to %s", date_table, lower, upper)
+        if method == "sql":
+            params = {"start": lower.to_pydatetime(), "end": upper.to_pydatetime(), "step": "1 hour"}
+            connection.execute(text(sql.insert_date_dim.format(date_table=date_table)), params)
+        else:
+            date_df = generate_date_dim(start_date=lower, end_date=upper, freq="H")
+            load_to_stage(date_df, connection, date_table, if_exists="append", method=load_method)
+
+
 def load_to_report(query, connection):
-    """Execute an SQL query to load data into a report table."""
+    """Execute an SQL query to load data into a report table and return the number of rows it affected."""
     logger.info("Loading data into %s", query)
-    connection.execute(query)
-    connection.execute("COMMIT")
+    rowcount = connection.execute(query).rowcount
+    if not connection.in_transaction():  # committed with the merge phase otherwise
+        connection.execute("COMMIT")
     logger.info("Loading data into %s completed", query)
+    return rowcount
 
 
-def extract_transform_and_load(db_config, api_config, csv_config, connection):
-    """Extract data from various sources, transform, and load into staging tables."""
+def extract_glasses(api_config, cache=None):
+    """Extract the glass list from the API."""
+    glass_param = dict(api_config["glass"], cache=cache)
+    return extract_and_validate(parameters=glass_param, extract_func=APIExtractor)
 
-    logger.info("Running load_data_to staging")
 
-    # glass data from API
-    glass_param = api_config["glass"]
+def stage_glasses(db_config, api_config, glass_df, connection, state=None):
+    """Load the glass list into its staging table and return the staging tables that received data."""
+    skip_unchanged = state is not None and db_config.get("skip_unchanged", False)
+    glass_name = api_config["glass"]["name"]
     glass_table = db_config["glass_table_stage"]
-    glass_df = extract_and_validate(parameters=glass_param, extract_func=APIExtractor)
-    load_to_stage(glass_df, connection, glass_table)
+    if skip_unchanged and state.unchanged(glass_name, frame_fingerprint(glass_df)):
+        return set()
+    started = time.perf_counter()
+    with staging_indexes(connection, db_config, "glass_table_stage"):
+        load_to_stage(glass_df, connection, glass_table, **stage_options(db_config))
+    if state is not None:
+        state.update(glass_name, duration=time.perf_counter() - started)
+    return {glass_table}
 
-    # cocktail data from API
-    drink_param = api_config["cocktail"]
+
+def stage_cocktails(db_config, api_config, glass_list, connection, state=None, cache=None):
+    """Extract the cocktails served in every glass from the API and load them into their staging table."""
+    skip_unchanged = state is not None and db_config.get("skip_unchanged", False)
+    drink_param = dict(api_config["cocktail"], cache=cache)
     drink_table = db_config["cocktail_table_stage"]
-    glass_list = glass_df["glass"].unique().tolist()
-    cocktail_df = get_cocktail_by_glass(parameters=drink_param, glass_list=glass_list, extract_func=APIExtractor)
-    load_to_stage(cocktail_df, connection, drink_table)
+    cocktail_df = get_cocktail_by_glass(
+        parameters=drink_param,
+        glass_list=glass_list,
+        extract_func=APIExtractor,
+        max_workers=api_config.get("concurrency", 1),
+    )
+    if skip_unchanged and state.unchanged(drink_param["name"], frame_fingerprint(cocktail_df)):
+        return set()
+    started = time.perf_counter()
+    with staging_indexes(connection, db_config, "cocktail_table_stage"):
+        load_to_stage(cocktail_df, connection, drink_table, **stage_options(db_config))
+    if state is not None:
+        state.update(drink_param["name"], duration=time.perf_counter() - started)
+    return {drink_table}
+
+
+def create_staging_cache(cache_config):
+    """Create the staging cache, None when it is not configured or pyarrow is not installed."""
+    if not cache_config:
+        return None
+    try:
+        return StagingCache(**cache_config)
+    except ImportError as e:
+        logger.warning("%s, running without the staging cache", e)
+        return None
 
-    # bar stock data from csv
+
+def stage_bar_stock(db_config, csv_config, connection, state=None, staging_cache=None):
+    """Extract and validate the bar stock CSV and load it into its staging table."""
+    skip_unchanged = state is not None and db_config.get("skip_unchanged", False)
     bar_stock_param = csv_config["bar_stock"]
     stock_table = db_config["stock_table_stage"]
-    stock_df = extract_and_validate(parameters=bar_stock_param, extract_func=CSVExtractor, schema=bar_stock_schema)
-    load_to_stage(stock_df, connection, stock_table)
+    stock_path = bar_stock_param["pandas_kwargs"]["filepath_or_buffer"]
+    if skip_unchanged and state.unchanged(bar_stock_param["name"], file_fingerprint(stock_path)):
+        return set()
+    started = time.perf_counter()
+    stock_df = extract_and_validate(
+        parameters=bar_stock_param, extract_func=CSVExtractor, schema=bar_stock_schema, staging_cache=staging_cache
+    )
+    with staging_indexes(connection, db_config, "stock_table_stage"):
+        load_to_stage(stock_df, connection, stock_table, **stage_options(db_config))
+    record_durations(state, [bar_stock_param], time.perf_counter() - started)
+    return {stock_table}
+
+
+def stage_transactions(db_config, csv_config, connection, state=None, staging_cache=None):
+    """Extract and validate the transaction CSVs and load them into their staging table.
 
-    # extract transaction data from csv validate and load into staging table
+    When a SourceStateStore is given, transactions are loaded incrementally
+    and/or unchanged sources are skipped, as configured. When a StagingCache is
+    given, sources whose file is unchanged are read from it instead of the CSV
+    (streamed sources are not cached). With the key_cache option the location
+    and drink names are replaced with the bar and cocktail ids before loading.
+    """
+    incremental = state is not None and db_config.get("incremental", False)
+    skip_unchanged = state is not None and db_config.get("skip_unchanged", False)
+    started = time.perf_counter()
     transaction_table = db_config["transaction_table_stage"]
-    transaction_df = pd.DataFrame()
-    for param in csv_config["transactions"]:
-        tmp = extract_and_validate(parameters=param, extract_func=CSVExtractor, schema=trainsaction_schema)
-        tmp["location"] = param["name"]
-        transaction_df = pd.concat([transaction_df, tmp], axis=0, ignore_index=True)
-    load_to_stage(transaction_df, connection, transaction_table)
+    transaction_sources = pending_transaction_sources(
+        csv_config["transactions"], state, incremental=incremental, skip_unchanged=skip_unchanged
+    )
+    key_cache = DimensionKeyCache(connection) if db_config.get("key_cache") else None
+    if any(param.get("chunksize") for param in transaction_sources):
+        # streaming mode: extract, validate and load chunk by chunk to bound memory
+        chunks = stream_transactions(transaction_sources, state if incremental else None)
+        if key_cache is not None:
+            chunks = (key_transactions(chunk, key_cache) for chunk in chunks)
+        with staging_indexes(connection, db_config, "transaction_table_stage"):
+            transaction_rows = load_chunks_to_stage(chunks, connection, transaction_table, **stage_options(db_config))
+    else:
+        collector = SourceCollector(label_column="location")
+        for name, tmp in extract_sources(
+            sources=transaction_sources,
+            extract_func=CSVExtractor,
+            schema=trainsaction_schema,
+            workers=csv_config.get("workers", 1),
+            staging_cache=staging_cache,
+        ):
+            collector.add(name, tmp)
+            if incremental:
+                state.advance_watermark(name, tmp)
+        transaction_df = collector.combine()
+        if key_cache is not None and not transaction_df.empty:
+            transaction_df = key_transactions(transaction_df, key_cache)
+        transaction_rows = len(transaction_df)
+        with staging_indexes(connection, db_config, "transaction_table_stage"):
+            load_to_stage(transaction_df, connection, transaction_table, **stage_options(db_config))
+    record_durations(state, transaction_sources, time.perf_counter() - started)
+    if not transaction_rows:
+        logger.info("No new transactions to load into %s", transaction_table)
+        return set()
+    return {transaction_table}
 
-    # this will be a one time process as the date dimension table will be static
-    if db_config["initial_load"]:
-        date_table = db_config["date_table"]
-        date_df = generate_date_dim(start_date="2020-01-01", end_date="2030-12-31", freq="H")
-        load_to_stage(date_df, connection, date_table)
 
+def stage_date_dim(db_config, connection):
+    """Extend the date dimension with the hours of the configured range it does not cover yet."""
+    date_dim_config = db_config.get("date_dim")
+    if date_dim_config is None and db_config.get("initial_load"):
+        date_dim_config = {"start": "2020-01-01", "end": "2030-12-31"}
+    if date_dim_config:
+        extend_date_dim(
+            connection, db_config["date_table"], load_method=db_config.get("load_method", "copy"), **date_dim_config
+        )
+    return set()
 
-def update_report_tables(db_config, connection):
-    """Update report tables from staging tables."""
 
-    logger.info("Updating report tables from staging")
+def month_partitions(table_name, months):
+    """Return the name and the [start, end) bounds of the monthly partition of table_name of every month start."""
+    partitions = []
+    for start in months:
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        partitions.append((f"{table_name}_y{start:%Y}m{start:%m}", start, end))
+    return partitions
+
+
+def transaction_merge_query(keyed, partitioned):
+    """Return the statement merging the staged transactions into the fact table, or into one of its partitions.
+
+    Staging tables keyed by the key cache are appended without joining the
+    dimension tables, the others are joined with them on the names.
+    """
+    if partitioned:
+        return sql.append_transaction_partition if keyed else sql.insert_transaction_partition
+    return sql.append_transaction_table if keyed else sql.insert_transaction_table
+
+
+def merge_transactions(temp_table, connection, table_name="fact_transactions"):
+    """Merge the staged transactions into the fact table and return the number of rows inserted.
 
-    # update bars table
-    stock_temp_table = db_config["stock_table_stage"]
-    load_to_report(sql.insert_bar_table.format(temp_table=stock_temp_table), connection)
+    When the fact table is range partitioned by month, the partitions of the
+    months present in the staging table are created when missing and every
+    month of the batch is merged into its own partition only, so the merge cost
+    follows the batch size rather than the history size. Unpartitioned tables
+    are merged with a single statement. When the staging table holds the bar and
+    cocktail ids resolved by the key cache, the transactions missing from the
+    fact table are appended without joining the dimension tables. Staged rows
+    are merged once, as chunked loads only drop the duplicates within a chunk.
+    """
+    keyed = "cocktail_id" in {column["name"] for column in inspect(connection).get_columns(temp_table)}
+    if connection.dialect.name != "postgresql" or not connection.execute(
+        text(sql.is_partitioned), {"table_name": table_name}
+    ).scalar():
+        query = transaction_merge_query(keyed, partitioned=False)
+        return load_to_report(query.format(temp_table=temp_table), connection)
 
-    # update glasses table
-    glass_temp_table = db_config["glass_table_stage"]
-    load_to_report(sql.insert_glass_table.format(temp_table=glass_temp_table), connection)
+    months = connection.execute(text(sql.select_staged_months.format(temp_table=temp_table))).scalars().all()
+    rows = 0
+    transaction = nullcontext() if connection.in_transaction() else connection.begin()
+    with transaction:
+        for partition, start, end in month_partitions(table_name, months):
+            connection.execute(
+                text(
+                    sql.create_month_partition.format(
+                        partition=partition, table_name=table_name, start=f"{start:%Y-%m-%d}", end=f"{end:%Y-%m-%d}"
+                    )
+                )
+            )
+            query = transaction_merge_query(keyed, partitioned=True).format(partition=partition, temp_table=temp_table)
+            inserted = connection.execute(text(query), {"start": start, "end": end}).rowcount
+            logger.info("Merged %s transactions into %s", inserted, partition)
+            rows += inserted
+    return rows
 
-    # update cocktails table
-    cocktail_temp_table = db_config["cocktail_table_stage"]
-    load_to_report(sql.insert_cocktail_table.format(temp_table=cocktail_temp_table), connection)
 
-    # update stock table
-    stock_temp_table = db_config["stock_table_stage"]
-    load_to_report(sql.insert_stock_table.format(temp_table=stock_temp_table), connection)
+# rollup table and the query adding the fact_transactions rows of an id range to its totals
+ROLLUPS = {
+    "sales_bar_cocktail_hourly": sql.update_sales_bar_cocktail_hourly,
+    "sales_bar_glass_daily": sql.update_sales_bar_glass_daily,
+}
 
-    # update transaction table
-    transaction_temp_table = db_config["transaction_table_stage"]
-    load_to_report(sql.insert_transaction_table.format(temp_table=transaction_temp_table), connection)
 
+def update_rollup(rollup, temp_table, connection):
+    """Add the transactions merged since the last update of a rollup table to its totals.
+
+    Every rollup keeps the id of the last fact_transactions row it includes in
+    etl_rollup_watermarks, so only the rows merged by this run are aggregated,
+    and the totals and the watermark are updated in one transaction. The first
+    update aggregates the whole fact table. The rollup tables are created with
+    the report tables by utils/sql.py. Returns the number of rollup rows
+    inserted or updated.
+    """
+    transaction = nullcontext() if connection.in_transaction() else connection.begin()
+    with transaction:
+        last_id = connection.execute(text(sql.select_rollup_watermark), {"rollup": rollup}).scalar() or 0
+        max_id = connection.execute(text(sql.select_last_transaction_id)).scalar()
+        if max_id <= last_id:
+            logger.info("%s is up to date", rollup)
+            return 0
+        rows = connection.execute(text(ROLLUPS[rollup]), {"last_id": last_id, "max_id": max_id}).rowcount
+        connection.execute(text(sql.upsert_rollup_watermark), {"rollup": rollup, "last_id": max_id})
+    logger.info("Added transactions %s to %s to %s, %s rows updated", last_id + 1, max_id, rollup, rows)
+    return rows
+
+
+# report table, merge query (or function called with the staging table and the connection),
+# staging table config key and the report tables the merge reads from
+REPORT_MERGES = [
+    ("bars", sql.insert_bar_table, "stock_table_stage", []),
+    ("glasses", sql.insert_glass_table, "glass_table_stage", []),
+    ("cocktails", sql.insert_cocktail_table, "cocktail_table_stage", ["glasses"]),
+    ("bar_stock", sql.insert_stock_table, "stock_table_stage", ["bars", "glasses"]),
+    ("fact_transactions", merge_transactions, "transaction_table_stage", ["bars", "cocktails"]),
+] + [
+    (rollup, partial(update_rollup, rollup), "transaction_table_stage", ["fact_transactions"]) for rollup in ROLLUPS
+]
+
+
+def report_merges(db_config):
+    """Return the REPORT_MERGES of the run, the rollups are only maintained when enabled."""
+    return [merge for merge in REPORT_MERGES if merge[0] not in ROLLUPS or db_config.get("rollups")]
+
+# staging task loading each staging table
+STAGE_TASKS = {
+    "glass_table_stage": "stage glasses",
+    "cocktail_table_stage": "stage cocktails",
+    "stock_table_stage": "stage bar_stock",
+    "transaction_table_stage": "stage transactions",
+}
+
+# sources selectable from the command line, with the tasks extracting and staging them
+# and the report tables merged from them
+SOURCE_STAGE_TASKS = {
+    "glasses": ["extract glasses", "stage glasses"],
+    "cocktails": ["extract glasses", "stage cocktails"],
+    "bar_stock": ["stage bar_stock"],
+    "transactions": ["stage transactions"],
+    "date_dim": ["stage date_dim"],
+}
+SOURCE_REPORT_TABLES = {
+    "glasses": ["glasses"],
+    "cocktails": ["cocktails"],
+    "bar_stock": ["bars", "bar_stock"],
+    "transactions": ["fact_transactions", *ROLLUPS],
+    "date_dim": [],
+}
+SOURCES = list(SOURCE_STAGE_TASKS)
+PHASES = ("stage", "merge")
+
+
+def select_tasks(tasks, sources=None, phases=PHASES):
+    """Return the tasks of the phases ("stage" extracts and stages, "merge" merges) of the sources, default all."""
+    sources = sources or SOURCES
+    names = set()
+    if "stage" in phases:
+        names.update(name for source in sources for name in SOURCE_STAGE_TASKS[source])
+    if "merge" in phases:
+        report_tables = [table for source in sources for table in SOURCE_REPORT_TABLES[source]]
+        names.update(f"merge {report_table}" for report_table in report_tables)
+        if report_tables:
+            names.add("merge report tables")
+    return [task for task in tasks if task.name in names]
+
+
+def merge_report_table(report_table, query, temp_table, connection, staged=None, state=None):
+    """Merge a staging table into its report table.
+
+    When staged is given and does not contain temp_table, the staging table
+    received no new data in this run and the merge is skipped.
+    """
+    stage = f"merge {report_table}"
+    if staged is not None and temp_table not in staged:
+        logger.info("Skipping %s, no new rows in %s", stage, temp_table)
+        if state is not None:
+            state.skip(stage)
+        return
+    started = time.perf_counter()
+    with measure("merge", report_table) as metrics:
+        if callable(query):
+            metrics.rows_out = query(temp_table, connection)
+        else:
+            metrics.rows_out = load_to_report(query.format(temp_table=temp_table), connection)
+    if state is not None:
+        state.update(stage, duration=time.perf_counter() - started)
+
+
+def build_tasks(db_config, api_config, csv_config, connect, state=None, sources=None, phases=PHASES):
+    """Build the pipeline dependency graph of the phases of the sources, default all (see select_tasks).
+
+    Every stage task returns the staging tables it loaded. The extracts only
+    depend on each other where data flows between them (cocktails are fetched
+    per glass) and every merge depends on the staging of its input and on the
+    report tables it resolves ids from. With the single_transaction_merge
+    option the merges run in one task, in one transaction, once every staging
+    table is loaded; transactions are then staged with their names, as the key
+    cache can not resolve ids from uncommitted merges. connect is called by every
+    task that needs the database to get its own connection context manager.
+    """
+    if db_config.get("single_transaction_merge") and db_config.get("key_cache"):
+        logger.warning("key_cache is ignored with single_transaction_merge, transactions are staged with their names")
+        db_config = {**db_config, "key_cache": False}
+
+    def created_once(create):
+        # the caches create their directory, so they are only created by the first task using them
+        lock, instances = threading.Lock(), []
+
+        def get():
+            with lock:
+                if not instances:
+                    instances.append(create())
+                return instances[0]
+        return get
+
+    # responses are served from the on-disk cache when configured
+    cache = created_once(lambda: ResponseCache(**api_config["cache"]) if api_config.get("cache") else None)
+    # validated CSV data is read from the columnar staging cache while the files are unchanged
+    staging_cache = created_once(lambda: create_staging_cache(csv_config.get("staging_cache")))
+
+    def connected(func):
+        def run(results):
+            with connect() as connection:
+                return func(connection, results)
+        return run
+
+    def glasses(connection, results):
+        return stage_glasses(db_config, api_config, results["extract glasses"], connection, state)
+
+    def cocktails(connection, results):
+        glass_list = results["extract glasses"]["glass"].unique().tolist()
+        return stage_cocktails(db_config, api_config, glass_list, connection, state, cache())
+
+    def bar_stock(connection, results):
+        return stage_bar_stock(db_config, csv_config, connection, state, staging_cache())
+
+    def transactions(connection, results):
+        return stage_transactions(db_config, csv_config, connection, state, staging_cache())
+
+    def date_dim(connection, results):
+        return stage_date_dim(db_config, connection)
+
+    def merge_all(connection, results):
+        # staging tables of the stage tasks that are not part of this run are merged unconditionally
+        staged = set().union(
+            *(results[task] if task in results else {db_config[key]} for key, task in STAGE_TASKS.items())
+        )
+        report_tables = [table for source in sources or SOURCES for table in SOURCE_REPORT_TABLES[source]]
+        update_report_tables(db_config, connection, staged, state, report_tables)
+
+    def merge(report_table, query, temp_key):
+        def run(connection, results):
+            # merges run unconditionally when their staging task is not part of this run
+            staged = results.get(STAGE_TASKS[temp_key])
+            merge_report_table(report_table, query, db_config[temp_key], connection, staged, state)
+        return connected(run)
+
+    tasks = [
+        Task("extract glasses", lambda results: extract_glasses(api_config, cache())),
+        Task("stage glasses", connected(glasses), depends_on=["extract glasses"]),
+        Task("stage cocktails", connected(cocktails), depends_on=["extract glasses"]),
+        Task("stage bar_stock", connected(bar_stock)),
+        # the key cache resolves the bar and cocktail ids of the transactions once they are merged
+        Task(
+            "stage transactions",
+            connected(transactions),
+            depends_on=["merge bars", "merge cocktails"] if db_config.get("key_cache") else [],
+        ),
+        Task("stage date_dim", connected(date_dim)),
+    ]
+    if db_config.get("single_transaction_merge"):
+        tasks.append(Task("merge report tables", connected(merge_all), depends_on=list(STAGE_TASKS.values())))
+        return select_tasks(tasks, sources, phases)
+    for report_table, query, temp_key, reads_from in report_merges(db_config):
+        tasks.append(
+            Task(
+                f"merge {report_table}",
+                merge(report_table, query, temp_key),
+                depends_on=[STAGE_TASKS[temp_key]] + [f"merge {name}" for name in reads_from],
+            )
+        )
+    return select_tasks(tasks, sources, phases)
+
+
+def update_report_tables(db_config, connection, staged=None, state=None, report_tables=None):
+    """Update report tables from staging tables.
+
+    When staged is given, merges reading from a staging table that received
+    no new data in this run are skipped. When report_tables is given, only
+    those tables are merged. With the single_transaction_merge option all
+    merges run in one transaction committed at the end, so a failed merge
+    leaves every report table as it was before the run.
+    """
+
+    logger.info("Updating report tables from staging")
+    single_transaction = db_config.get("single_transaction_merge") and not connection.in_transaction()
+    with connection.begin() if single_transaction else nullcontext():
+        for report_table, query, temp_key, _ in report_merges(db_config):
+            if report_tables is not None and report_table not in report_tables:
+                continue
+            merge_report_table(report_table, query, db_config[temp_key], connection, staged, state)
     logger.info("Report tables update completed")
 
 
-def main():
+def write_run_report(report, report_config, engine):
+    """Write the run report as JSON and/or into the metrics table, as configured."""
+    if report_config.get("directory"):
+        report.write_json(report_config["directory"])
+    if report_config.get("table"):
+        metrics_table = sql.RunMetric.__table__.to_metadata(MetaData(), name=report_config["table"])
+        with engine.begin() as connection:
+            metrics_table.create(connection, checkfirst=True)
+            report.write_table(connection, metrics_table)
+
+
+def write_rejects(quarantine, quarantine_config, engine):
+    """Write the rows rejected by validation to a CSV file and/or the rejects table, as configured."""
+    if not len(quarantine):
+        return
+    logger.warning("%s validation failures were quarantined", len(quarantine))
+    if quarantine_config.get("directory"):
+        quarantine.write_csv(quarantine_config["directory"])
+    if quarantine_config.get("table"):
+        rejects_table = sql.Reject.__table__.to_metadata(MetaData(), name=quarantine_config["table"])
+        with engine.begin() as connection:
+            rejects_table.create(connection, checkfirst=True)
+            quarantine.write_table(connection, rejects_table)
+
+
+def main(config=None, sources=None, phases=PHASES):
+    """Run the phases of the pipeline for the sources (default all) and return whether it completed.
+
+    config defaults to the content of CONFIG_PATH.
+    """
     logger.info("ETL process started")
-    config = load_config(CONFIG_PATH)
+    config = config or load_config(CONFIG_PATH)
     csv_config = config["CSV"]
     api_config = config["API"]
     db_config = config["DATABASE"]
+    pipeline_config = config.get("PIPELINE", {})
+    report_config = pipeline_config.get("run_report") or {}
     engine = create_db_connection()
     connection = engine.connect()
+    report = RunReport()
+    quarantine = Quarantine(run_id=report.run_id)
 
     try:
-        extract_transform_and_load(db_config, api_config, csv_config, connection)
-        update_report_tables(db_config, connection)
+        # watermarks and fingerprints are only saved once the data is merged into the report tables
+        use_state = db_config.get("incremental") or db_config.get("skip_unchanged")
+        state = SourceStateStore(connection) if use_state else None
+        tasks = build_tasks(db_config, api_config, csv_config, engine.connect, state, sources, phases)
+        with recording(report), quarantining(quarantine):
+            run_tasks(tasks, max_workers=pipeline_config.get("max_workers", 1))
+        if state is not None and "merge" in phases:
+            state.save()
+            report.extra.update(state.report())
+        elif state is not None:
+            # the staged rows are not merged yet, the next run stages them again
+            logger.info("Not saving the pipeline state of a run without the merge phase")
         logger.info("ETL process completed")
+        return True
     except Exception as e:
         logger.error("ETL process encountered an error: %s", str(e))
+        return False
     finally:
         connection.close()
+        # the report is also written for failed runs, the failed steps have the failed status
+        try:
+            report.extra["rejected"] = len(quarantine)
+            write_rejects(quarantine, pipeline_config.get("quarantine") or {}, engine)
+            write_run_report(report, report_config, engine)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Writing the rejects and run report failed: %s", str(e))
 
 
 if __name__ == "__main__":
-    logger = custom_logger(name="ETL Pipeline")  # Initialize the custom logger.
-    main()
\ No newline at end of file
+    custom_logger(name="ETL Pipeline")  # Initialize the custom logger.
+    main()
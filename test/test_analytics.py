@@ -0,0 +1,35 @@
+import pandas as pd
+from utils.analytics import DEMAND_COLUMNS, glass_demand
+
+
+def test_glass_demand_per_bar_and_hour():
+    transactions = pd.DataFrame(
+        {
+            "location": ["London", "London", "London", "London", "Budapest"],
+            "drink": ["Mojito", "Mojito", "Sidecar", "Mojito", "Unknown"],
+            "time": pd.to_datetime(
+                ["2020-12-30 10:05", "2020-12-30 10:40", "2020-12-30 10:50", "2020-12-30 11:00", "2020-12-30 11:00"]
+            ),
+        }
+    )
+    # Mojito is served in two glasses and counts in the first by name, Highball
+    cocktails = pd.DataFrame({"drink": ["Mojito", "Sidecar", "Mojito"], "glass": ["Martini", "Coupe", "Highball"]})
+    bar_stock = pd.DataFrame(
+        {"glass_type": ["Highball", "Coupe", "Shot Glass"], "stock": [1, 5, 10], "bar": ["London"] * 3}
+    )
+
+    demand = glass_demand(transactions, cocktails, bar_stock, percentile=0.5)
+
+    assert demand.columns.tolist() == DEMAND_COLUMNS
+    # the bar without known drinks is left out, the unused stocked glass is kept
+    assert demand[["bar", "glass"]].values.tolist() == [
+        ["London", "Coupe"], ["London", "Highball"], ["London", "Shot Glass"]
+    ]
+    highball = demand.iloc[1]
+    assert highball["peak_hourly_demand"] == 2
+    assert highball["percentile_demand"] == 1.5
+    assert highball["mean_hourly_demand"] == 1.5
+    assert highball["shortfall"] == 1
+    assert highball["percentile_shortfall"] == 1
+    assert demand.iloc[0][["peak_hourly_demand", "stock", "shortfall"]].tolist() == [1, 5, 0]
+    assert demand.iloc[2]["peak_hourly_demand"] == 0
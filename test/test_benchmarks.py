@@ -0,0 +1,20 @@
+from benchmarks.bench_pipeline import benchmark_config
+from benchmarks.generate_data import generate_dataset
+from benchmarks.stub_api import default_catalog
+from main import load_config
+from utils.custom import bar_stock_schema, extract_and_validate, trainsaction_schema
+from utils.data_extractor import CSVExtractor
+
+
+def test_generated_data_matches_configured_dialects(tmp_path):
+    catalog = default_catalog(glass_count=3, drinks_per_glass=2)
+    paths = generate_dataset(str(tmp_path), 50, catalog, chunk_rows=20)
+    config = benchmark_config(load_config("config.yaml"), paths, "http://localhost")
+
+    for param in config["CSV"]["transactions"]:
+        df = extract_and_validate(param, CSVExtractor, trainsaction_schema)
+        assert len(df) > 40  # a few random duplicates are dropped
+        assert set(df["drink"]) <= {drink for drinks in catalog.values() for drink in drinks}
+        assert df["time"].dt.year.eq(2020).all()
+    stock_df = extract_and_validate(config["CSV"]["bar_stock"], CSVExtractor, bar_stock_schema)
+    assert len(stock_df) == 9
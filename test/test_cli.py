@@ -0,0 +1,65 @@
+import copy
+import pytest
+import cli
+import main
+from utils import csv_engines, validation
+from main import build_tasks
+
+CONFIG = cli.load_config("config.yaml")
+
+
+def test_cli_constants_match_the_pipeline():
+    assert cli.SOURCES == main.SOURCES
+    assert cli.ENGINES == csv_engines.ENGINES
+    assert cli.DTYPE_BACKENDS == csv_engines.DTYPE_BACKENDS
+    assert cli.VALIDATION_MODES == validation.VALIDATION_MODES
+
+
+def test_select_sources_restricts_transactions_to_the_named_sources():
+    config, sources = cli.select_sources(CONFIG, ["London", "glasses"])
+
+    assert sources == ["glasses", "transactions"]
+    assert [source["name"] for source in config["CSV"]["transactions"]] == ["London"]
+    assert len(CONFIG["CSV"]["transactions"]) > 1
+    assert cli.select_sources(CONFIG, None) == (CONFIG, main.SOURCES)
+    with pytest.raises(ValueError, match="Unknown source"):
+        cli.select_sources(CONFIG, ["Paris"])
+
+
+def test_config_errors():
+    assert cli.config_errors(CONFIG) == []
+    config = copy.deepcopy(CONFIG)
+    del config["DATABASE"]["transaction_table_stage"]
+    config["CSV"]["transactions"][0]["engine"] = "spark"
+    config["CSV"]["transactions"][1]["name"] = config["CSV"]["transactions"][0]["name"]
+
+    errors = cli.config_errors(config)
+
+    assert "DATABASE.transaction_table_stage is required" in errors
+    assert any("engine must be one of" in error for error in errors)
+    assert any("duplicate source" in error for error in errors)
+    config["DATABASE"].update(single_transaction_merge=True, key_cache=True)
+    assert any("key_cache can not be used" in error for error in cli.config_errors(config))
+
+
+def test_build_tasks_selects_the_phases_of_the_sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = dict(CONFIG["DATABASE"], single_transaction_merge=False)
+    tasks = build_tasks(config, CONFIG["API"], CONFIG["CSV"], connect=None, sources=["glasses"])
+    assert [task.name for task in tasks] == ["extract glasses", "stage glasses", "merge glasses"]
+    # the response and staging caches are only created by the tasks using them
+    assert not list(tmp_path.iterdir())
+
+    tasks = build_tasks(config, CONFIG["API"], CONFIG["CSV"], connect=None, sources=["bar_stock"], phases=("merge",))
+    assert [task.name for task in tasks] == ["merge bars", "merge bar_stock"]
+
+
+def test_extract_creates_the_response_cache_only_for_api_sources(monkeypatch, capsys):
+    def response_cache(**_):
+        raise AssertionError("the response cache was created")
+
+    monkeypatch.setattr("utils.data_extractor.ResponseCache", response_cache)
+    args = cli.parse_args(["extract", "--source", "bar_stock"])
+
+    assert cli.extract(args) == 0
+    assert "bar_stock:" in capsys.readouterr().out
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from utils.csv_engines import read_csv
+
+pytest.importorskip("pyarrow")
+
+
+def headerless_source(path):
+    path.write_text(
+        "1\t12-30-2020 10:00\tmojito\t5.5\n2\t12-30-2020 11:00\tsidecar\t11.0\n3\t12-31-2020 09:30\tmojito\t4\n"
+    )
+    return {
+        "filepath_or_buffer": str(path),
+        "sep": "\t",
+        "header": None,
+        "usecols": [1, 2, 3],
+        "dtype": {2: "category", 3: "float32"},
+        "parse_dates": [1],
+        "date_format": "%m-%d-%Y %H:%M",
+    }
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "polars"])
+def test_read_csv_engines_match_pandas(tmp_path, engine):
+    if engine == "polars":
+        pytest.importorskip("polars")
+    kwargs = headerless_source(tmp_path / "london.csv")
+    expected = pd.read_csv(**kwargs)
+
+    df = read_csv(kwargs, engine=engine)
+
+    pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+    arrow_df = read_csv(kwargs, engine=engine, dtype_backend="pyarrow")
+    assert arrow_df.columns.tolist() == [1, 2, 3]
+    assert isinstance(arrow_df[1].dtype, pd.ArrowDtype)
+    assert pd.api.types.is_datetime64_any_dtype(arrow_df[1].dtype)
+    assert arrow_df[1].tolist() == expected[1].tolist()
+
+
+def test_read_csv_falls_back_to_pandas_for_unsupported_options(tmp_path, caplog):
+    kwargs = headerless_source(tmp_path / "london.csv")
+    kwargs["skiprows"] = 1
+
+    with caplog.at_level("INFO", logger="utils.csv_engines"):
+        df = read_csv(kwargs, engine="pyarrow")
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(**kwargs))
+    assert "skiprows" in caplog.text
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "polars"])
+def test_read_csv_engines_read_blank_and_na_fields_as_nulls(tmp_path, engine):
+    if engine == "polars":
+        pytest.importorskip("polars")
+    path = tmp_path / "new_york.csv"
+    path.write_text(
+        "time,drink,amount\n2020-12-30 10:00:00,mojito,5.5\n2020-12-30 11:00:00,,NA\n"
+        "2020-12-30 12:00:00,NA,\n2020-12-30 13:00:00,N/A,null\n"
+    )
+    kwargs = {
+        "filepath_or_buffer": str(path),
+        "dtype": {"drink": "category", "amount": "float32"},
+        "parse_dates": ["time"],
+        "date_format": "%Y-%m-%d %H:%M:%S",
+    }
+    expected = pd.read_csv(**kwargs)
+
+    df = read_csv(kwargs, engine=engine)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["drink"].isna().tolist() == [False, True, True, True]
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "polars"])
+def test_read_csv_falls_back_to_pandas_on_malformed_values(tmp_path, engine, caplog):
+    if engine == "polars":
+        pytest.importorskip("polars")
+    path = tmp_path / "new_york.csv"
+    path.write_text("time,drink,amount\n2020-12-30 10:00:00,mojito,5.5\n2020-13-45 11:00,sidecar,4\n")
+    kwargs = {"filepath_or_buffer": str(path), "parse_dates": ["time"], "date_format": "%Y-%m-%d %H:%M:%S"}
+
+    with caplog.at_level("WARNING", logger="utils.csv_engines"):
+        df = read_csv(kwargs, engine=engine)
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(**kwargs))
+    assert "reading with pandas" in caplog.text
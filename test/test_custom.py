@@ -0,0 +1,119 @@
+import pytest
+import pandas as pd
+import pandera as pa
+from benchmarks.stub_api import StubCocktailAPI
+from utils.custom import SourceCollector, extract_sources, get_cocktail_by_glass
+from utils.custom import generate_date_dim, missing_date_ranges
+from utils.custom import bar_stock_schema, trainsaction_schema
+from utils.data_extractor import CSVExtractor, APIExtractor
+
+
+@pytest.fixture
+def csv_sample():
+    data = {
+        "glass_type": ["Cocktail Glass", "Shot Glass", "Highball Glass"],
+        "stock": [8, 31, 37],
+        "bar": ['Budapest', 'New York', 'London'],
+    }
+    return pd.DataFrame(data)
+
+
+def test_source_collector_combines_once():
+    collector = SourceCollector(label_column="location")
+    collector.add("Budapest", pd.DataFrame({"drink": ["Mojito", "Margarita"]}))
+    collector.add("London", pd.DataFrame({"drink": ["Sidecar"]}))
+    collector.add("Budapest", pd.DataFrame({"drink": ["Snowball"]}))
+
+    df = collector.combine()
+    assert len(collector) == 3
+    assert df["drink"].tolist() == ["Mojito", "Margarita", "Sidecar", "Snowball"]
+    assert isinstance(df["location"].dtype, pd.CategoricalDtype)
+    assert df["location"].cat.categories.tolist() == ["Budapest", "London"]
+    assert df["location"].tolist() == ["Budapest", "Budapest", "London", "Budapest"]
+
+
+def test_source_collector_empty():
+    df = SourceCollector(label_column="location").combine()
+    assert df.empty
+    assert df.columns.tolist() == ["location"]
+
+
+def test_extract_sources_process_pool(csv_sample):
+    sources = [
+        {
+            "name": name,
+            "pandas_kwargs": {"filepath_or_buffer": "test/sample.csv"},
+            "capitalize_columns": ["bar", "glass_type"],
+        }
+        for name in ("first", "second")
+    ]
+    results = dict(extract_sources(sources, CSVExtractor, bar_stock_schema, workers=2))
+    assert sorted(results) == ["first", "second"]
+    for df in results.values():
+        pd.testing.assert_frame_equal(df, csv_sample)
+
+
+def test_get_cocktail_by_glass_concurrent():
+    catalog = {"Highball Glass": ["Mojito", "Cuba Libre"], "Shot Glass": ["b-52"]}
+    with StubCocktailAPI(catalog=catalog) as stub:
+        parameters = {
+            "name": "drinks_api",
+            "request_obj": {"url": stub.url + "/filter.php?g={glass}"},
+            "data_field": "drinks",
+            "columns_mapping": {"strDrink": "drink"},
+            "drop_columns": ["strDrinkThumb", "idDrink"],
+            "capitalize_columns": ["drink"],
+        }
+        df = get_cocktail_by_glass(parameters, list(catalog), APIExtractor, max_workers=4)
+    assert df["drink"].tolist() == ["Mojito", "Cuba Libre", "B-52"]
+    assert df["glass"].tolist() == ["Highball Glass", "Highball Glass", "Shot Glass"]
+    assert stub.requests == 2
+    assert parameters["request_obj"]["url"].endswith("{glass}")
+
+
+def test_source_collector_keeps_categoricals():
+    collector = SourceCollector(label_column="location")
+    collector.add("Budapest", pd.DataFrame({"drink": pd.Categorical(["Mojito", "Margarita"])}))
+    collector.add("London", pd.DataFrame({"drink": pd.Categorical(["Sidecar", "Mojito"])}))
+
+    df = collector.combine()
+    assert isinstance(df["drink"].dtype, pd.CategoricalDtype)
+    assert df["drink"].tolist() == ["Mojito", "Margarita", "Sidecar", "Mojito"]
+
+
+def test_schemas_accept_compact_dtypes():
+    transactions = pd.DataFrame({
+        "time": pd.to_datetime(["2020-12-30 15:15:53", "2020-12-31 18:02:26"]),
+        "drink": pd.Categorical(["Mojito", "Sidecar"]),
+        "amount": pd.Series([5.5, 11.0], dtype="float32"),
+    })
+    trainsaction_schema.validate(transactions, lazy=True)
+
+    stock = pd.DataFrame({
+        "glass_type": pd.Categorical(["Shot Glass"]),
+        "stock": pd.Series([-1], dtype="int32"),
+        "bar": ["Budapest"],
+    })
+    with pytest.raises(pa.errors.SchemaErrors):
+        bar_stock_schema.validate(stock, lazy=True)
+
+
+def test_generate_date_dim_matches_strftime():
+    df = generate_date_dim(start_date="2020-12-28", end_date="2021-01-04", freq="H")
+    dates = pd.date_range(start="2020-12-28", end="2021-01-04", freq="H")
+    assert len(df) == len(dates)
+    assert df["date_id"].tolist() == dates.strftime("%Y-%m-%dT%H:%M:%S").tolist()
+    assert df["month"].tolist() == dates.strftime("%B").tolist()
+    assert df["day_name"].tolist() == dates.strftime("%A").tolist()
+    assert df["week_number"].tolist() == dates.isocalendar().week.tolist()
+    assert (df["date"] == dates.normalize()).all()
+
+
+def test_missing_date_ranges():
+    assert missing_date_ranges("2020-01-01", "2020-01-02") == [
+        (pd.Timestamp("2020-01-01"), pd.Timestamp("2020-01-02"))
+    ]
+    assert missing_date_ranges(
+        "2020-01-01", "2020-01-03", "2020-01-01T00:00:00", "2020-01-02T00:00:00"
+    ) == [(pd.Timestamp("2020-01-02 01:00"), pd.Timestamp("2020-01-03"))]
+    assert missing_date_ranges("2020-01-01", "2020-01-02", "2019-12-31", "2020-01-05") == []
@@ -0,0 +1,54 @@
+import pandas as pd
+from sqlalchemy import create_engine, select
+from utils import sql
+from utils.dimensions import DimensionKeyCache, key_transactions
+
+
+def dimension_connection():
+    connection = create_engine("sqlite://").connect()
+    for model in (sql.Bar, sql.Glass, sql.Cocktail):
+        model.__table__.create(connection)
+    connection.execute(sql.Bar.__table__.insert(), [{"bar": "Budapest"}, {"bar": "London"}])
+    connection.execute(sql.Glass.__table__.insert(), [{"glass": "Highball Glass"}, {"glass": "Shot Glass"}])
+    connection.execute(
+        sql.Cocktail.__table__.insert(),
+        [{"glass_id": 1, "drink": "Mojito"}, {"glass_id": 2, "drink": "Mojito"}, {"glass_id": 2, "drink": "B-52"}],
+    )
+    return connection
+
+
+def test_key_cache_maps_names_to_ids():
+    cache = DimensionKeyCache(dimension_connection())
+    names = pd.Series(pd.Categorical(["London", "Budapest", "London", None]), index=[10, 11, 12, 13])
+    ids = cache.ids("bars", names)
+    assert ids.index.tolist() == [10, 11, 12, 13]
+    assert ids.tolist()[:3] == [2, 1, 2] and pd.isna(ids[13])
+    assert cache.ids("cocktails", pd.Series(["Mojito", "B-52"])).tolist() == [1, 3]
+
+
+def test_key_cache_resolves_drinks_to_their_first_glass_by_name():
+    connection = dimension_connection()
+    # Mojito is also served in a Collins Glass, added after its other glasses
+    connection.execute(sql.Glass.__table__.insert(), [{"glass": "Collins Glass"}])
+    connection.execute(sql.Cocktail.__table__.insert(), [{"glass_id": 3, "drink": "Mojito"}])
+
+    assert DimensionKeyCache(connection).ids("cocktails", pd.Series(["Mojito", "B-52"])).tolist() == [4, 3]
+
+
+def test_key_transactions_adds_bars_and_drops_unknown_drinks():
+    connection = dimension_connection()
+    cache = DimensionKeyCache(connection)
+    df = pd.DataFrame(
+        {
+            "time": pd.to_datetime(["2020-12-30 10:00", "2020-12-30 11:00", "2020-12-30 12:00"]),
+            "drink": pd.Categorical(["Mojito", "Unknown", "B-52"]),
+            "amount": [5.5, 4.0, 11.0],
+            "location": pd.Categorical(["New York", "London", "London"]),
+        }
+    )
+    keyed = key_transactions(df, cache)
+
+    assert keyed.columns.tolist() == ["bar_id", "cocktail_id", "amount", "time"]
+    assert keyed["bar_id"].tolist() == [3, 2]
+    assert keyed["cocktail_id"].tolist() == [1, 3]
+    assert connection.execute(select(sql.Bar.bar).where(sql.Bar.id == 3)).scalar() == "New York"
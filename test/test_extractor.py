@@ -1,8 +1,11 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 import requests
 from unittest.mock import patch, Mock
 import pandas as pd
-from utils.data_extractor import CSVExtractor, APIExtractor
+from utils.data_extractor import CSVExtractor, APIExtractor, ResponseCache
 
 
 @pytest.fixture
@@ -68,4 +71,85 @@ def test_api_extractor(api_sample,mock_requests_get):
     
     df = api.fetch_data()
     assert df.shape == (3, 1)
-    pd.testing.assert_frame_equal(df, api_sample)
\ No newline at end of file
+    pd.testing.assert_frame_equal(df, api_sample)
+
+def test_csv_extractor_chunks(csv_sample):
+    chunks = list(CSVExtractor(
+        name = "sample",
+        pandas_kwargs = {"filepath_or_buffer": "test/sample.csv"},
+        capitalize_columns = ["bar", "glass_type"],
+        chunksize = 2,
+    ).fetch_chunks())
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), csv_sample)
+
+
+def _cached_api(cache, session):
+    return APIExtractor(
+        name = "sample",
+        request_obj = {"url": "https://www.thecocktaildb.com/api/json/v1/1/list.php?g=list"},
+        data_field = "drinks",
+        columns_mapping = {"strGlass": "glass"},
+        capitalize_columns = ["glass"],
+        session = session,
+        cache = cache,
+    )
+
+
+def test_api_extractor_cache_revalidation(tmp_path, api_sample):
+    response = Mock(status_code=200, headers={"ETag": '"v1"'})
+    response.json.return_value = {"drinks": [{"strGlass": glass} for glass in api_sample["glass"]]}
+    session = Mock()
+    session.get.return_value = response
+    cache = ResponseCache(directory=str(tmp_path), ttl=3600)
+
+    pd.testing.assert_frame_equal(_cached_api(cache, session).fetch_data(), api_sample)
+    pd.testing.assert_frame_equal(_cached_api(cache, session).fetch_data(), api_sample)
+    assert session.get.call_count == 1  # second run served from the cache
+
+    cache.ttl = 0
+    session.get.return_value = Mock(status_code=304, headers={})
+    pd.testing.assert_frame_equal(_cached_api(cache, session).fetch_data(), api_sample)
+    assert session.get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+
+def test_api_extractor_cache_serves_stale_on_error(tmp_path, api_sample):
+    cache = ResponseCache(directory=str(tmp_path), ttl=0)
+    request_obj = {"url": "https://www.thecocktaildb.com/api/json/v1/1/list.php?g=list"}
+    cache.set(cache.key(request_obj), {"drinks": [{"strGlass": glass} for glass in api_sample["glass"]]})
+    session = Mock()
+    session.get.side_effect = requests.Timeout()
+
+    pd.testing.assert_frame_equal(_cached_api(cache, session).fetch_data(), api_sample)
+
+
+def test_response_cache_lru_eviction(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"payload": "x" * 50})
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+
+def test_response_cache_concurrent_writes_of_a_key(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: cache.set("glass", {"drinks": [i] * 1000}), range(64)))
+    assert len(set(cache.get("glass")["payload"]["drinks"])) == 1
+    assert os.listdir(tmp_path) == ["glass.json"]
+
+
+def test_api_extractor_drops_duplicates_after_normalizing(mock_requests_get):
+    mock_response = Mock()
+    mock_response.json.return_value = {"drinks": [{"strGlass": "Coffee mug"}, {"strGlass": "Coffee Mug"}]}
+    mock_requests_get.return_value = mock_response
+
+    df = APIExtractor(
+        name="sample",
+        request_obj={"url": "https://www.thecocktaildb.com/api/json/v1/1/list.php?g=list"},
+        columns_mapping={"strGlass": "glass"},
+        normalize_columns={"glass": ["title"]},
+        data_field="drinks",
+    ).fetch_data()
+    assert df["glass"].tolist() == ["Coffee Mug"]
@@ -0,0 +1,109 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+import main
+from main import ROLLUPS, load_to_stage, load_chunks_to_stage, report_merges, update_report_tables
+from main import month_partitions, transaction_merge_query
+from utils import sql
+
+
+def test_load_to_stage_falls_back_to_to_sql():
+    connection = create_engine("sqlite://").connect()
+    df = pd.DataFrame({"glass": ["Cocktail Glass", "Shot Glass"]})
+
+    load_to_stage(df, connection, "tmp_glasses", method="copy")
+    load_to_stage(df.head(1), connection, "tmp_glasses", if_exists="append", method="copy")
+    assert pd.read_sql("SELECT * FROM tmp_glasses", connection)["glass"].tolist() == [
+        "Cocktail Glass", "Shot Glass", "Cocktail Glass"
+    ]
+
+
+def test_load_chunks_to_stage_replaces_then_appends():
+    connection = create_engine("sqlite://").connect()
+    pd.DataFrame({"drink": ["Stale"]}).to_sql("tmp_transactions", connection, index=False)
+    chunks = [pd.DataFrame({"drink": ["Mojito"]}), pd.DataFrame({"drink": []}), pd.DataFrame({"drink": ["Sidecar"]})]
+
+    load_chunks_to_stage(iter(chunks), connection, "tmp_transactions")
+    assert pd.read_sql("SELECT * FROM tmp_transactions", connection)["drink"].tolist() == ["Mojito", "Sidecar"]
+
+
+def test_rollups_are_merged_after_the_fact_table_when_enabled():
+    assert not {report_table for report_table, _, _, _ in report_merges({})} & set(ROLLUPS)
+
+    merges = report_merges({"rollups": True})
+    report_tables = [report_table for report_table, _, _, _ in merges]
+    assert report_tables[-len(ROLLUPS):] == list(ROLLUPS)
+    assert all(reads_from == ["fact_transactions"] for _, _, _, reads_from in merges[-len(ROLLUPS):])
+
+
+def test_single_transaction_merge_rolls_back_every_report_table(monkeypatch):
+    connection = create_engine("sqlite://").connect()
+    connection.execute("CREATE TABLE bars (bar TEXT)")
+    pd.DataFrame({"bar": ["London"]}).to_sql("tmp_stocks", connection, index=False)
+    monkeypatch.setattr(
+        main,
+        "REPORT_MERGES",
+        [
+            ("bars", "INSERT INTO bars SELECT bar FROM {temp_table}", "stock_table_stage", []),
+            ("glasses", "INSERT INTO glasses SELECT glass FROM {temp_table}", "glass_table_stage", []),
+        ],
+    )
+    db_config = {"stock_table_stage": "tmp_stocks", "glass_table_stage": "tmp_glasses"}
+
+    with pytest.raises(OperationalError):
+        update_report_tables({**db_config, "single_transaction_merge": True}, connection)
+    assert connection.execute("SELECT COUNT(*) FROM bars").scalar() == 0
+
+    with pytest.raises(OperationalError):
+        update_report_tables(db_config, connection)
+    assert connection.execute("SELECT COUNT(*) FROM bars").scalar() == 1
+
+
+def test_month_partitions_roll_over_the_year():
+    months = [datetime(2020, 11, 1), datetime(2020, 12, 1), datetime(2021, 1, 1)]
+    assert month_partitions("fact_transactions", months) == [
+        ("fact_transactions_y2020m11", datetime(2020, 11, 1), datetime(2020, 12, 1)),
+        ("fact_transactions_y2020m12", datetime(2020, 12, 1), datetime(2021, 1, 1)),
+        ("fact_transactions_y2021m01", datetime(2021, 1, 1), datetime(2021, 2, 1)),
+    ]
+    assert month_partitions("fact_transactions", []) == []
+
+
+def test_transaction_merge_query_appends_keyed_staging_tables():
+    assert transaction_merge_query(keyed=True, partitioned=False) == sql.append_transaction_table
+    assert transaction_merge_query(keyed=False, partitioned=False) == sql.insert_transaction_table
+    assert transaction_merge_query(keyed=True, partitioned=True) == sql.append_transaction_partition
+    assert transaction_merge_query(keyed=False, partitioned=True) == sql.insert_transaction_partition
+
+
+def test_state_is_only_saved_by_runs_that_merge(monkeypatch):
+    engine = create_engine("sqlite://")
+    monkeypatch.setattr(main, "create_db_connection", lambda: engine)
+
+    def build_tasks(db_config, api_config, csv_config, connect, state, sources, phases):
+        return [main.Task("stage transactions", lambda results: state.update("London", file_size=10))]
+
+    monkeypatch.setattr(main, "build_tasks", build_tasks)
+    config = {"CSV": {}, "API": {}, "DATABASE": {"incremental": True}}
+
+    assert main.main(config, phases=("stage",))
+    assert pd.read_sql("SELECT * FROM etl_source_state", engine).empty
+    assert main.main(config)
+    assert pd.read_sql("SELECT source, file_size FROM etl_source_state", engine).values.tolist() == [["London", 10]]
+
+
+def test_merge_transactions_drops_duplicates_spanning_chunks():
+    engine = create_engine("sqlite://")
+    # the partitioned fact table of utils/sql.py can not be created on sqlite
+    engine.execute(
+        "CREATE TABLE fact_transactions (id INTEGER PRIMARY KEY, bar_id INT, cocktail_id INT, amount FLOAT, date TIMESTAMP)"
+    )
+    row = {"bar_id": 1, "cocktail_id": 2, "amount": 5.5, "time": pd.Timestamp("2020-12-30 10:00")}
+    chunks = [pd.DataFrame([row, dict(row, cocktail_id=3)]), pd.DataFrame([row])]
+    with engine.connect() as connection:
+        load_chunks_to_stage(chunks, connection, "tmp_transactions")
+        with connection.begin():
+            assert main.merge_transactions("tmp_transactions", connection) == 2
+        assert pd.read_sql("SELECT cocktail_id FROM fact_transactions", connection)["cocktail_id"].tolist() == [2, 3]
@@ -0,0 +1,67 @@
+import json
+import pytest
+from sqlalchemy import MetaData, create_engine, select
+from utils import sql
+from utils.custom import extract_and_validate, trainsaction_schema
+from utils.data_extractor import CSVExtractor
+from utils.metrics import RunReport, measure, recording, ru_maxrss_mb
+
+
+def test_measure_merges_repeated_steps():
+    report = RunReport(run_id="test")
+    with recording(report):
+        for rows in (3, 4):
+            with measure("stage_load", "tmp_transactions") as metrics:
+                metrics.rows_in = rows
+        with pytest.raises(ValueError):
+            with measure("merge", "bars"):
+                raise ValueError("failed merge")
+    with measure("merge", "glasses"):  # not recorded once the report is closed
+        pass
+
+    records = {record["name"]: record for record in report.records()}
+    assert set(records) == {"tmp_transactions", "bars"}
+    assert records["tmp_transactions"]["calls"] == 2
+    assert records["tmp_transactions"]["rows_in"] == 7
+    assert records["tmp_transactions"]["status"] == "ok"
+    assert records["bars"]["status"] == "failed"
+    assert records["bars"]["wall_seconds"] >= 0 and records["bars"]["cpu_seconds"] >= 0
+
+
+def test_extract_and_validate_records_steps(tmp_path):
+    path = tmp_path / "transactions.csv"
+    path.write_text("time,drink,amount\n2020-12-30 10:00:00,mojito,5.5\n2020-12-30 11:00:00,sidecar,11.0\n")
+    params = {"name": "London", "pandas_kwargs": {"filepath_or_buffer": str(path), "parse_dates": ["time"]}}
+    report = RunReport()
+    with recording(report):
+        extract_and_validate(params, CSVExtractor, trainsaction_schema)
+
+    records = {record["stage"]: record for record in report.records()}
+    assert records["extract"]["rows_out"] == 2
+    assert records["extract"]["bytes_read"] == path.stat().st_size
+    assert records["validate"]["rows_in"] == records["validate"]["rows_out"] == 2
+
+
+def test_run_report_outputs(tmp_path):
+    report = RunReport(run_id="test")
+    with recording(report):
+        with measure("extract", "Budapest") as metrics:
+            metrics.rows_out = 10
+
+    with open(report.write_json(str(tmp_path)), encoding="utf-8") as file:
+        content = json.load(file)
+    assert content["run_id"] == "test"
+    assert content["stages"][0]["rows_out"] == 10
+
+    table = sql.RunMetric.__table__.to_metadata(MetaData(), name="run_metrics")
+    with create_engine("sqlite://").begin() as connection:
+        table.create(connection)
+        report.write_table(connection, table)
+        rows = connection.execute(select(table.c.run_id, table.c.stage, table.c.rows_out)).all()
+    assert rows == [("test", "extract", 10)]
+
+
+
+def test_ru_maxrss_mb_per_platform():
+    assert ru_maxrss_mb(2048 * 1024, "linux") == 2048
+    assert ru_maxrss_mb(2048 * 1024 * 1024, "darwin") == 2048
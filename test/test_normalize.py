@@ -0,0 +1,25 @@
+import pytest
+import pandas as pd
+from utils.normalize import normalization_plan, normalize_series
+
+
+def test_normalize_series_distinct_values():
+    series = pd.Series([" mojito", "Mojito ", "café latte", None, "sidecar"], name="drink")
+    result = normalize_series(series, ["strip", "nfc", "title"])
+    assert result.tolist() == ["Mojito", "Mojito", "Café Latte", None, "Sidecar"]
+    assert result.dtype == object
+
+
+def test_normalize_series_keeps_categoricals():
+    series = pd.Series(["mojito", "MOJITO", "sidecar"], dtype="category")
+    result = normalize_series(series, ["title"])
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert result.cat.categories.tolist() == ["Mojito", "Sidecar"]
+    assert result.tolist() == ["Mojito", "Mojito", "Sidecar"]
+
+
+def test_normalization_plan():
+    plan = normalization_plan(["drink", "bar"], {"drink": ["strip"]})
+    assert plan == {"drink": ["strip", "title"], "bar": ["title"]}
+    with pytest.raises(ValueError):
+        normalization_plan(normalize_columns={"drink": ["reverse"]})
@@ -0,0 +1,64 @@
+import json
+import pandas as pd
+import pandera as pa
+import pytest
+from sqlalchemy import MetaData, create_engine, select
+from utils import sql
+from utils.custom import bar_stock_schema, extract_and_validate, extract_sources, trainsaction_schema
+from utils.data_extractor import CSVExtractor
+from utils.quarantine import Quarantine, quarantining
+
+
+def write_transactions(path, amounts):
+    rows = "".join(f"2020-12-30 1{i}:00:00,mojito,{amount}\n" for i, amount in enumerate(amounts))
+    path.write_text("time,drink,amount\n" + rows)
+    return {
+        "name": path.stem,
+        "pandas_kwargs": {"filepath_or_buffer": str(path), "parse_dates": ["time"]},
+        "validation": {"mode": "fast", "on_error": "quarantine"},
+    }
+
+
+def test_invalid_rows_are_quarantined(tmp_path):
+    params = write_transactions(tmp_path / "London.csv", [5.5, 0, 11.0, -2.0])
+    quarantine = Quarantine(run_id="test")
+    with quarantining(quarantine):
+        df = extract_and_validate(params, CSVExtractor, trainsaction_schema)
+
+    assert df["amount"].tolist() == [5.5, 11.0]
+    rejects = quarantine.rejects()
+    assert rejects["row"].tolist() == [1, 3]
+    assert set(rejects["source"]) == {"London"}
+    assert set(rejects["check"]) == {"greater_than(0)"}
+    assert json.loads(rejects["data"][1])["amount"] == -2.0
+
+    table = sql.Reject.__table__.to_metadata(MetaData(), name="rejects")
+    with create_engine("sqlite://").begin() as connection:
+        table.create(connection)
+        quarantine.write_table(connection, table)
+        assert connection.execute(select(table.c.run_id, table.c.row)).all() == [("test", 1), ("test", 3)]
+    assert pd.read_csv(quarantine.write_csv(str(tmp_path / "rejects")))["row"].tolist() == [1, 3]
+
+
+def test_quarantine_from_worker_processes(tmp_path):
+    sources = [
+        write_transactions(tmp_path / "London.csv", [5.5, -1.0]),
+        write_transactions(tmp_path / "Budapest.csv", [4.0, 0]),
+    ]
+    quarantine = Quarantine()
+    with quarantining(quarantine):
+        results = dict(extract_sources(sources, CSVExtractor, trainsaction_schema, workers=2))
+    assert {name: len(df) for name, df in results.items()} == {"London": 1, "Budapest": 1}
+    assert sorted(quarantine.rejects()["source"]) == ["Budapest", "London"]
+
+
+def test_column_errors_are_not_quarantined(tmp_path):
+    path = tmp_path / "bar_data.csv"
+    path.write_text("glass_type,stock,bar\nshot glass,1.5,budapest\n")
+    params = {
+        "name": "bar_stock",
+        "pandas_kwargs": {"filepath_or_buffer": str(path)},
+        "validation": {"on_error": "quarantine"},
+    }
+    with pytest.raises(pa.errors.SchemaErrors):
+        extract_and_validate(params, CSVExtractor, bar_stock_schema)
@@ -0,0 +1,49 @@
+import threading
+import pytest
+from utils.scheduler import Task, run_tasks
+
+
+def test_run_tasks_respects_dependencies():
+    order = []
+
+    def record(name, value):
+        def run(results):
+            order.append(name)
+            return value
+        return run
+
+    tasks = [
+        Task("merge", lambda results: results["extract"] + results["stage"], depends_on=["extract", "stage"]),
+        Task("stage", record("stage", 2), depends_on=["extract"]),
+        Task("extract", record("extract", 1)),
+    ]
+    results = run_tasks(tasks, max_workers=4)
+    assert order == ["extract", "stage"]
+    assert results == {"extract": 1, "stage": 2, "merge": 3}
+
+
+def test_run_tasks_runs_independent_tasks_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    tasks = [Task(name, lambda results: barrier.wait()) for name in ("bars", "glasses")]
+    run_tasks(tasks, max_workers=2)  # would time out if the tasks ran in sequence
+
+
+def test_run_tasks_stops_after_failure():
+    ran = []
+
+    def fail(results):
+        raise RuntimeError("extract failed")
+
+    tasks = [
+        Task("extract", fail),
+        Task("merge", lambda results: ran.append("merge"), depends_on=["extract"]),
+    ]
+    with pytest.raises(RuntimeError, match="extract failed"):
+        run_tasks(tasks)
+    assert ran == []
+
+
+def test_run_tasks_rejects_cycles():
+    tasks = [Task("a", lambda results: None, depends_on=["b"]), Task("b", lambda results: None, depends_on=["a"])]
+    with pytest.raises(ValueError):
+        run_tasks(tasks)
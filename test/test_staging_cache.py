@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+import pytest
+from utils.custom import extract_and_validate, trainsaction_schema
+from utils.data_extractor import CSVExtractor
+from utils.metrics import RunReport, recording
+
+pytest.importorskip("pyarrow")
+
+from utils.staging_cache import StagingCache, source_key  # noqa: E402 pylint: disable=wrong-import-position
+
+
+def transaction_source(path):
+    path.write_text(
+        "time,drink,amount\n2020-11-30 10:00:00,mojito,5.5\n2020-12-01 11:00:00,sidecar,11.0\n"
+        "2020-12-30 12:00:00,mojito,4.0\n"
+    )
+    return {
+        "name": "London",
+        "pandas_kwargs": {
+            "filepath_or_buffer": str(path),
+            "parse_dates": ["time"],
+            "dtype": {"drink": "category", "amount": "float32"},
+        },
+    }
+
+
+@pytest.mark.parametrize("cache_format", ["parquet", "arrow"])
+def test_staging_cache_round_trip(tmp_path, cache_format):
+    params = transaction_source(tmp_path / "london.csv")
+    cache = StagingCache(str(tmp_path / "cache"), format=cache_format)
+    df = extract_and_validate(params, CSVExtractor, trainsaction_schema)
+    key = source_key(params)
+
+    cache.write("London", key, df)
+    assert sorted(os.listdir(tmp_path / "cache" / "London")) == [
+        "_manifest.json", f"month=2020-11.{cache_format}", f"month=2020-12.{cache_format}"
+    ]
+    cached_df = cache.read("London", key)
+    pd.testing.assert_frame_equal(cached_df, df.reset_index(drop=True))
+    assert cache.read("London", "other key") is None
+
+
+def test_extract_and_validate_reads_unchanged_sources_from_cache(tmp_path):
+    params = transaction_source(tmp_path / "london.csv")
+    cache = StagingCache(str(tmp_path / "cache"))
+    first = extract_and_validate(params, CSVExtractor, trainsaction_schema, staging_cache=cache)
+
+    report = RunReport()
+    with recording(report):
+        second = extract_and_validate(params, CSVExtractor, trainsaction_schema, staging_cache=cache)
+    assert {record["stage"] for record in report.records()} == {"cache_read"}
+    assert second["amount"].tolist() == first["amount"].tolist()
+
+    with open(params["pandas_kwargs"]["filepath_or_buffer"], "a", encoding="utf-8") as file:
+        file.write("2020-12-31 12:00:00,sidecar,11.0\n")
+    assert len(extract_and_validate(params, CSVExtractor, trainsaction_schema, staging_cache=cache)) == 4
@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+from sqlalchemy import create_engine
+from utils.data_extractor import CSVExtractor
+from utils.state import SourceStateStore, file_fingerprint, frame_fingerprint
+
+
+def test_source_state_store_watermarks(tmp_path):
+    path = tmp_path / "transactions.csv"
+    path.write_text("time,drink,amount\n2020-12-30 10:00:00,mojito,5.5\n2020-12-30 11:00:00,sidecar,11.0\n")
+    connection = create_engine("sqlite://").connect()
+
+    state = SourceStateStore(connection)
+    assert state.file_changed("London", str(path))
+    df = pd.read_csv(path, parse_dates=["time"])
+    state.advance_watermark("London", df)
+    state.save()
+
+    state = SourceStateStore(connection)
+    assert not state.file_changed("London", str(path))
+    assert state.watermark("London") == pd.Timestamp("2020-12-30 11:00:00")
+
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("2020-12-30 12:00:00,limeade,3.5\n")
+    os.utime(path, (0, 0))
+    assert state.file_changed("London", str(path))
+    new_rows = CSVExtractor(
+        name="London",
+        pandas_kwargs={"filepath_or_buffer": str(path), "parse_dates": ["time"]},
+        capitalize_columns=["drink"],
+        watermark_column="time",
+        watermark=state.watermark("London"),
+    ).fetch_data()
+    assert new_rows["drink"].tolist() == ["Limeade"]
+
+
+def test_source_state_store_skips_unchanged_fingerprints(tmp_path):
+    path = tmp_path / "bar_data.csv"
+    path.write_text("glass_type,stock,bar\ncocktail glass,8,budapest\n")
+    df = pd.DataFrame({"glass": ["Cocktail Glass"]})
+    connection = create_engine("sqlite://").connect()
+
+    state = SourceStateStore(connection)
+    assert not state.unchanged("bar_stock", file_fingerprint(str(path)))
+    assert not state.unchanged("glass_api", frame_fingerprint(df))
+    state.update("bar_stock", duration=2.0)
+    state.save()
+
+    state = SourceStateStore(connection)
+    assert state.unchanged("bar_stock", file_fingerprint(str(path)))
+    assert not state.unchanged("glass_api", frame_fingerprint(pd.DataFrame({"glass": ["Shot Glass"]})))
+    assert state.report() == {"skipped": ["bar_stock"], "seconds_saved": 2.0}
+
+
+def test_append_only_sources_only_parse_the_appended_bytes(tmp_path):
+    path = tmp_path / "transactions.csv"
+    path.write_text("time,drink,amount\n2020-12-30 10:00:00,mojito,5.5\n")
+    connection = create_engine("sqlite://").connect()
+    state = SourceStateStore(connection)
+    state.file_changed("London", str(path))
+    state.save()
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("2020-12-30 09:00:00,limeade,3.5\n")
+
+    def extract(byte_offset):
+        return CSVExtractor(
+            name="London",
+            pandas_kwargs={"filepath_or_buffer": str(path), "parse_dates": ["time"]},
+            append_only=True,
+            byte_offset=byte_offset,
+        ).fetch_data()
+
+    # no watermark filter, the first row is skipped by the offset alone
+    assert extract(state.file_size("London"))["drink"].tolist() == ["limeade"]
+    # an offset past the end of a rewritten file, or within a line, reads it in full
+    assert extract(os.path.getsize(path) + 10)["drink"].tolist() == ["mojito", "limeade"]
+    assert extract(state.file_size("London") - 3)["drink"].tolist() == ["mojito", "limeade"]
@@ -0,0 +1,65 @@
+import pandas as pd
+import pandera as pa
+import pytest
+from utils.custom import bar_stock_schema, trainsaction_schema
+from utils.validation import compile_schema, failing_rows, validate_frame
+
+
+def transactions(amounts, start=0):
+    return pd.DataFrame(
+        {
+            "time": pd.date_range("2020-12-30", periods=len(amounts), freq="H"),
+            "drink": pd.Categorical(["Mojito"] * len(amounts)),
+            "amount": pd.array(amounts, dtype="float32"),
+        },
+        index=pd.RangeIndex(start, start + len(amounts)),
+    )
+
+
+def test_fast_validation_accepts_valid_frames():
+    df = transactions([5.5, 11.0, 4.0])
+    assert validate_frame(df, trainsaction_schema, mode="fast") is df
+    assert compile_schema(trainsaction_schema).supported
+
+
+def test_fast_validation_reports_source_rows():
+    df = transactions([5.5, 0.0, 11.0, -1.0, 4.0], start=1000)  # e.g. the second chunk of a file
+    assert failing_rows(df, compile_schema(trainsaction_schema), chunk_rows=2).tolist() == [1001, 1003]
+
+    with pytest.raises(pa.errors.SchemaErrors) as error:
+        validate_frame(df, trainsaction_schema, mode="fast", chunk_rows=2)
+    failure_cases = error.value.failure_cases
+    assert sorted(failure_cases["index"]) == [1001, 1003]
+    assert set(failure_cases["check"]) == {"greater_than(0)"}
+
+
+def test_fast_validation_matches_pandera_on_column_errors():
+    stock_df = pd.DataFrame({"glass_type": ["Shot Glass"], "stock": [1.5], "bar": ["Budapest"]})
+    with pytest.raises(pa.errors.SchemaErrors):
+        validate_frame(stock_df, bar_stock_schema, mode="fast")
+    with pytest.raises(pa.errors.SchemaErrors):
+        validate_frame(transactions([5.5]).drop(columns="drink"), trainsaction_schema, mode="fast")
+    with pytest.raises(pa.errors.SchemaErrors):
+        validate_frame(transactions([5.5, None]), trainsaction_schema, mode="fast")
+
+
+def test_sample_validation():
+    df = transactions([5.5] * 50 + [-1.0])
+    assert validate_frame(df, trainsaction_schema, mode="sample", sample_size=5, seed=0) is df
+    with pytest.raises(pa.errors.SchemaErrors):
+        validate_frame(df, trainsaction_schema, mode="sample", sample_size=len(df))  # small frames are validated fully
+    with pytest.raises(ValueError):
+        validate_frame(df, trainsaction_schema, mode="unknown")
+
+
+def test_unseeded_samples_check_other_rows(caplog):
+    df = transactions([5.5] * 50 + [-1.0])
+    failures = 0
+    with caplog.at_level("INFO", logger="utils.validation"):
+        for _ in range(100):
+            try:
+                validate_frame(df, trainsaction_schema, mode="sample", sample_size=20)
+            except pa.errors.SchemaErrors:
+                failures += 1
+    assert 0 < failures < 100
+    assert "with seed" in caplog.text
@@ -0,0 +1,156 @@
+import logging
+from typing import Optional, Any as AnyType
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from utils import sql
+
+logger = logging.getLogger(__name__)
+
+DEMAND_COLUMNS = [
+    "bar",
+    "glass",
+    "peak_hourly_demand",
+    "percentile_demand",
+    "mean_hourly_demand",
+    "stock",
+    "shortfall",
+    "percentile_shortfall",
+]
+
+
+def hourly_glass_demand(
+    transactions: pd.DataFrame, cocktails: pd.DataFrame, bar_column: str = "location"
+) -> pd.DataFrame:
+    """
+    Count the glasses used per bar and hour, one per drink sold in the glass of its
+    cocktail. A drink served in several glasses counts in the first of them by name, as
+    in glass_demand_sql, transactions of drinks that are not a known cocktail are ignored.
+
+    parameters
+    ----------
+    transactions : pd.DataFrame
+        Transactions with the bar_column, drink and time columns.
+
+    cocktails : pd.DataFrame
+        Cocktails with the drink and glass columns.
+
+    bar_column : str
+        Column of transactions holding the bar name (default location).
+
+    Returns
+    -------
+    demand: pd.DataFrame
+        Glasses used with one row per bar and hour the bar sold a drink in and one
+        column per glass, zero when the glass was not used in that hour.
+    """
+    by_glass_name = np.argsort(cocktails["glass"].astype(str).to_numpy(), kind="stable")
+    glass_of_drink = cocktails.iloc[by_glass_name].drop_duplicates("drink").set_index("drink")["glass"]
+    times = transactions["time"]
+    if isinstance(times.dtype, pd.ArrowDtype):
+        times = times.astype("datetime64[ns]")
+    sales = pd.DataFrame(
+        {
+            "bar": transactions[bar_column].astype("category"),
+            "hour": times.dt.floor("h"),
+            # mapped once per distinct drink
+            "glass": transactions["drink"].astype("category").map(glass_of_drink),
+        }
+    )
+    counts = sales.groupby(["bar", "hour", "glass"], observed=True).size()
+    return counts.unstack("glass", fill_value=0)
+
+
+def glass_demand(
+    transactions: pd.DataFrame,
+    cocktails: pd.DataFrame,
+    bar_stock: pd.DataFrame,
+    percentile: float = 0.95,
+    bar_column: str = "location",
+) -> pd.DataFrame:
+    """
+    Compare the hourly glass demand of every bar with its glass stock.
+
+    The demand of a glass is the number of drinks served in it within an hour, over
+    the hours the bar sold any drink. Bars without transactions are left out, as are
+    glasses a bar neither used nor stocks.
+
+    parameters
+    ----------
+    transactions : pd.DataFrame
+        Transactions with the bar_column, drink and time columns.
+
+    cocktails : pd.DataFrame
+        Cocktails with the drink and glass columns.
+
+    bar_stock : pd.DataFrame
+        Glasses in stock with the bar, glass_type and stock columns.
+
+    percentile : float
+        Quantile of the hourly demand reported as percentile_demand (default 0.95).
+
+    bar_column : str
+        Column of transactions holding the bar name (default location).
+
+    Returns
+    -------
+    demand: pd.DataFrame
+        One row per bar and glass with the DEMAND_COLUMNS: the peak, percentile and mean
+        hourly demand, the stock (0 when not stocked), and the glasses missing to serve
+        the peak and the rounded up percentile demand.
+    """
+    hourly = hourly_glass_demand(transactions, cocktails, bar_column)
+    stock = bar_stock.groupby(
+        [bar_stock["bar"].astype(str), bar_stock["glass_type"].astype(str)], observed=True
+    )["stock"].sum()
+    stock.index.names = ["bar", "glass"]
+    hourly.columns = hourly.columns.astype(str)
+    hourly.index = hourly.index.set_levels(hourly.index.levels[0].astype(str), level="bar")
+    # glasses in stock that were never used anywhere have no demand column
+    unused = stock.index.get_level_values("glass").unique().difference(hourly.columns)
+    hourly = hourly.reindex(columns=hourly.columns.append(unused), fill_value=0)
+
+    by_bar = hourly.groupby(level="bar", observed=True)
+    demand = pd.DataFrame(
+        {
+            "peak_hourly_demand": by_bar.max().stack(),
+            "percentile_demand": by_bar.quantile(percentile).stack(),
+            "mean_hourly_demand": by_bar.mean().stack(),
+        }
+    )
+    demand.index.names = ["bar", "glass"]
+    demand["stock"] = stock.reindex(demand.index)
+    demand = demand[(demand["peak_hourly_demand"] > 0) | demand["stock"].notna()]
+    demand["stock"] = demand["stock"].fillna(0).astype(np.int64)
+    demand["shortfall"] = (demand["peak_hourly_demand"] - demand["stock"]).clip(lower=0)
+    demand["percentile_shortfall"] = (np.ceil(demand["percentile_demand"]) - demand["stock"]).clip(lower=0)
+    demand = demand.astype({"peak_hourly_demand": np.int64, "percentile_shortfall": np.int64})
+    logger.info("Computed the demand of %s glasses of %s bars", len(demand), hourly.index.levels[0].size)
+    return demand.reset_index().sort_values(["bar", "glass"], ignore_index=True)[DEMAND_COLUMNS]
+
+
+def glass_demand_sql(
+    connection, percentile: float = 0.95, start: Optional[AnyType] = None, end: Optional[AnyType] = None
+) -> pd.DataFrame:
+    """
+    Compute the glass_demand of the transactions in fact_transactions in the database
+    and return the same columns. Transactions are matched to their glass through their
+    cocktail, which the merges pick in the same first glass by name as glass_demand.
+
+    parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Connection to the Postgres database holding the report tables.
+
+    percentile : float
+        Quantile of the hourly demand reported as percentile_demand (default 0.95).
+
+    start, end : Optional[AnyType]
+        Only the transactions from start and before end are counted (default all).
+    """
+    demand = pd.read_sql(
+        text(sql.select_glass_demand),
+        connection,
+        params={"percentile": percentile, "start": start, "end": end},
+    )
+    return demand.astype({"mean_hourly_demand": float, "percentile_demand": float})[DEMAND_COLUMNS]
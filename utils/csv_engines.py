@@ -0,0 +1,180 @@
+import io
+import logging
+import importlib.util
+from typing import Callable, Dict, List, Optional, Tuple, Any as AnyType
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # the Arrow based engines are optional
+    pa = None
+    pa_csv = None
+
+# polars is only imported by the polars engine, importing it takes longer than reading a small file
+POLARS_INSTALLED = importlib.util.find_spec("polars") is not None
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ("pandas", "pyarrow", "polars")
+DTYPE_BACKENDS = ("numpy", "pyarrow")
+
+# the default na_values of pandas.read_csv, read as nulls by the Arrow based engines as well
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA",
+    "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# read_csv arguments the Arrow based engines translate, any other one falls back to pandas
+SUPPORTED_KWARGS = {
+    "filepath_or_buffer", "sep", "delimiter", "header", "usecols", "dtype", "parse_dates", "date_format"
+}
+
+
+def read_csv(
+    pandas_kwargs: Dict[AnyType, AnyType], engine: str = "pandas", dtype_backend: str = "numpy"
+) -> pd.DataFrame:
+    """
+    Read a CSV file described by pandas read_csv arguments with one of the ENGINES.
+
+    The pyarrow and polars engines parse the file on several threads and parse the
+    date columns natively with the date_format. They return the same columns and
+    dtypes as pandas (categoricals for the category dtype), or Arrow-backed columns
+    when dtype_backend is "pyarrow". When the engine is not installed or the
+    arguments use options it does not support, the file is read with pandas.
+
+    parameters
+    ----------
+    pandas_kwargs : Dict[AnyType, AnyType]
+        Arguments of pandas.read_csv.
+
+    engine : str
+        "pandas" (default), "pyarrow" or "polars".
+
+    dtype_backend : str
+        "numpy" (default) or "pyarrow" for Arrow-backed columns.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        DataFrame containing the data of the file.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine {engine!r}, expected one of {ENGINES}")
+    if dtype_backend not in DTYPE_BACKENDS:
+        raise ValueError(f"Unknown dtype backend {dtype_backend!r}, expected one of {DTYPE_BACKENDS}")
+    reader = _arrow_reader(pandas_kwargs, engine)
+    if reader is None:
+        if dtype_backend == "pyarrow":
+            return pd.read_csv(**pandas_kwargs, dtype_backend="pyarrow")
+        return pd.read_csv(**pandas_kwargs)
+    try:
+        table, columns = reader(pandas_kwargs)
+    except ValueError as e:  # e.g. pyarrow.ArrowInvalid or a polars cast error on a malformed value
+        logger.warning("The %s CSV engine failed (%s), reading with pandas", engine, str(e).splitlines()[0])
+        if hasattr(pandas_kwargs["filepath_or_buffer"], "seek"):
+            pandas_kwargs["filepath_or_buffer"].seek(0)
+        return read_csv(pandas_kwargs, "pandas", dtype_backend)
+    df = table.to_pandas(types_mapper=pd.ArrowDtype) if dtype_backend == "pyarrow" else table.to_pandas()
+    df.columns = columns
+    return df
+
+
+def _arrow_reader(pandas_kwargs: Dict[AnyType, AnyType], engine: str) -> Optional[Callable]:
+    """
+    Return the reader of the engine, returning an Arrow table and its pandas column
+    labels, or None when the file has to be read with pandas.
+    """
+    if engine == "pandas":
+        return None
+    if pa is None or (engine == "polars" and not POLARS_INSTALLED):
+        logger.warning("The %s CSV engine is not installed, reading with pandas", engine)
+        return None
+    unsupported = set(pandas_kwargs) - SUPPORTED_KWARGS
+    header = pandas_kwargs.get("header", "infer")
+    if header not in ("infer", 0, None):
+        unsupported.add("header")
+    if not isinstance(pandas_kwargs["filepath_or_buffer"], (str, io.BytesIO)):
+        unsupported.add("filepath_or_buffer")
+    usecols = pandas_kwargs.get("usecols")
+    if header is not None and usecols and any(isinstance(column, int) for column in usecols):
+        unsupported.add("usecols")
+    if len(pandas_kwargs.get("sep", pandas_kwargs.get("delimiter", ","))) != 1:
+        unsupported.add("sep")
+    if unsupported:
+        logger.info("The %s CSV engine does not support %s, reading with pandas", engine, sorted(map(str, unsupported)))
+        return None
+    return _read_pyarrow if engine == "pyarrow" else _read_polars
+
+
+def _arrow_type(dtype: AnyType) -> "pa.DataType":
+    """Return the Arrow type of a pandas dtype name, category is read as dictionary encoded strings."""
+    if str(dtype) == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _read_pyarrow(pandas_kwargs: Dict[AnyType, AnyType]) -> Tuple["pa.Table", List[AnyType]]:
+    has_header = pandas_kwargs.get("header", "infer") is not None
+    # headerless columns are named f0, f1, ... by Arrow and 0, 1, ... by pandas
+    name = (lambda column: column) if has_header else (lambda column: f"f{column}")
+    column_types = {name(column): _arrow_type(dtype) for column, dtype in (pandas_kwargs.get("dtype") or {}).items()}
+    for column in pandas_kwargs.get("parse_dates") or []:
+        column_types[name(column)] = pa.timestamp("ns")
+    date_format = pandas_kwargs.get("date_format")
+    usecols = pandas_kwargs.get("usecols")
+    table = pa_csv.read_csv(
+        pandas_kwargs["filepath_or_buffer"],
+        read_options=pa_csv.ReadOptions(use_threads=True, autogenerate_column_names=not has_header),
+        parse_options=pa_csv.ParseOptions(delimiter=pandas_kwargs.get("sep", pandas_kwargs.get("delimiter", ","))),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            include_columns=[name(column) for column in usecols] if usecols else None,
+            timestamp_parsers=[date_format] if date_format else None,
+            null_values=NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+    if has_header:
+        return table, table.column_names
+    return table, [int(column[1:]) for column in table.column_names]
+
+
+def _read_polars(pandas_kwargs: Dict[AnyType, AnyType]) -> Tuple["pa.Table", List[AnyType]]:
+    import polars as pl  # pylint: disable=import-outside-toplevel
+    has_header = pandas_kwargs.get("header", "infer") is not None
+    usecols = pandas_kwargs.get("usecols")
+    df = pl.read_csv(
+        pandas_kwargs["filepath_or_buffer"],
+        separator=pandas_kwargs.get("sep", pandas_kwargs.get("delimiter", ",")),
+        has_header=has_header,
+        columns=list(usecols) if usecols else None,
+        null_values=NA_VALUES,
+    )
+    # headerless columns are numbered by pandas, in file order like the selected columns
+    if has_header:
+        columns = df.columns
+    else:
+        columns = sorted(usecols) if usecols else list(range(df.width))
+        df.columns = [str(column) for column in columns]
+    casts = []
+    for column, dtype in (pandas_kwargs.get("dtype") or {}).items():
+        polars_type = pl.Categorical if str(dtype) == "category" else pl.Series(np.empty(0, dtype)).dtype
+        casts.append(pl.col(str(column)).cast(polars_type))
+    for column in pandas_kwargs.get("parse_dates") or []:
+        casts.append(
+            pl.col(str(column)).str.to_datetime(format=pandas_kwargs.get("date_format"), time_unit="ns")
+        )
+    try:
+        table = df.with_columns(casts).to_arrow()
+    except pl.exceptions.PolarsError as e:  # raised as ValueError by the Arrow reader
+        raise ValueError(str(e)) from e
+    # polars encodes categoricals with unsigned indices, which pandas does not support
+    table = table.cast(
+        pa.schema(
+            pa.field(field.name, _arrow_type("category")) if pa.types.is_dictionary(field.type) else field
+            for field in table.schema
+        )
+    )
+    return table, columns
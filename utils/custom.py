@@ -1,29 +1,66 @@
-import copy
+import os
 import logging
-from typing import List, Dict, Callable, Optional
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import List, Dict, Callable, Iterator, Optional, Tuple
+import numpy as np
 import pandas as pd
 import pandera as pa
+from utils.data_extractor import create_session
+from utils.metrics import RunReport, active_report, measure, recording
+from utils.validation import validate_frame, validation_options
+from utils.staging_cache import StagingCache, source_key
+from utils.quarantine import Quarantine, quarantine_rejects, quarantining, split_failures
 
 logger = logging.getLogger()
 
 
-# Schema validation for transaction and bar data
+def is_text(series: pd.Series):
+    """Check a column holds strings, stored as object, string or categorical dtype."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        return all(isinstance(value, str) for value in categories)
+    if pd.api.types.is_string_dtype(series.dtype) and series.dtype != object:
+        return True
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return True  # every value is a string, skips the per value check
+    return series.map(lambda value: isinstance(value, str)) | series.isna()
+
+
+def is_integer(series: pd.Series) -> bool:
+    """Check a column has an integer dtype of any width."""
+    return pd.api.types.is_integer_dtype(series.dtype)
+
+
+def is_float(series: pd.Series) -> bool:
+    """Check a column has a floating point dtype of any width."""
+    return pd.api.types.is_float_dtype(series.dtype)
+
+
+def is_datetime(series: pd.Series) -> bool:
+    """Check a column holds timestamps, stored as numpy datetime64 or Arrow timestamp dtype."""
+    return pd.api.types.is_datetime64_any_dtype(series.dtype)
+
+
+# Schema validation for transaction and bar data, the dtype checks accept the
+# compact dtypes (categoricals, float32, int32) configured per source and the
+# Arrow-backed dtypes of the pyarrow dtype backend
 bar_stock_schema = pa.DataFrameSchema(
     {
-        "glass_type": pa.Column(str, nullable=False),
+        "glass_type": pa.Column(checks=pa.Check(is_text, name="is_text"), nullable=False),
         "stock": pa.Column(
-            int, checks=pa.Check.gt(-1), nullable=False
+            checks=[pa.Check(is_integer, name="is_integer"), pa.Check.gt(-1)], nullable=False
         ),  # check there is no negative stock
-        "bar": pa.Column(str, nullable=False),
+        "bar": pa.Column(checks=pa.Check(is_text, name="is_text"), nullable=False),
     },
 )
 
 trainsaction_schema = pa.DataFrameSchema(
     {
-        "time": pa.Column("datetime64[ns]", nullable=False),
-        "drink": pa.Column(str, nullable=False),
+        "time": pa.Column(checks=pa.Check(is_datetime, name="is_datetime"), nullable=False),
+        "drink": pa.Column(checks=pa.Check(is_text, name="is_text"), nullable=False),
         "amount": pa.Column(
-            float, checks=pa.Check.gt(0), nullable=False
+            checks=[pa.Check(is_float, name="is_float"), pa.Check.gt(0)], nullable=False
         ),  # check all sales amount is greater than 0
     },
 )
@@ -56,9 +93,21 @@ def custom_logger(name="ETL Pipeline", level: str = "INFO", filename: str = "dat
     return logger
 
 
+MONTH_NAMES = np.array(
+    ["January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"],
+    dtype=object,
+)
+DAY_NAMES = np.array(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"], dtype=object
+)
+
+
 def generate_date_dim(start_date: str, end_date: str, freq: str = "H"):
     """generate date attribute for the given range and returns it as a DataFrame.
 
+    The labels are derived with vectorized lookups instead of strftime.
+
     parameters
     ----------
     start_date : str
@@ -75,23 +124,193 @@ def generate_date_dim(start_date: str, end_date: str, freq: str = "H"):
     df: pd.DataFrame
         DataFrame containing date-related columns.
     """
-    df = pd.DataFrame(
-        {"date": pd.date_range(start=start_date, end=end_date, freq=freq)}
+    dates = pd.date_range(start=start_date, end=end_date, freq=freq)
+    return pd.DataFrame(
+        {
+            "date": dates.normalize(),
+            "date_id": np.datetime_as_string(dates.values.astype("datetime64[s]"), unit="s").astype(object),
+            "calendar_day": dates.day,
+            "hour": dates.hour,
+            "week_number": dates.isocalendar().week.to_numpy(),
+            "month": MONTH_NAMES[dates.month - 1],
+            "quarter": dates.quarter,
+            "year": dates.year,
+            "day_name": DAY_NAMES[dates.dayofweek],
+        }
     )
-    df["date_id"] = df.date.dt.strftime("%Y-%m-%dT%H:%M:%S")
-    df["calender_day"] = df.date.dt.day
-    df["hour"] = df.date.dt.hour
-    df["week_number"] = df.date.dt.isocalendar().week
-    df["month"] = df.date.dt.strftime("%B")
-    df["quarter"] = df.date.dt.quarter
-    df["year"] = df.date.dt.year
-    df["day_name"] = df.date.dt.strftime("%A")
-    df["date"] = df.date.dt.date
-    return df
+
+
+def missing_date_ranges(
+    start_date: str,
+    end_date: str,
+    existing_min: Optional[pd.Timestamp] = None,
+    existing_max: Optional[pd.Timestamp] = None,
+    freq: str = "H",
+) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Returns the parts of the [start_date, end_date] range that are not yet
+    covered by a date dimension spanning [existing_min, existing_max].
+
+    parameters
+    ----------
+    start_date : str
+        Start date in "YYYY-MM-DD" format.
+
+    end_date : str
+        End date in "YYYY-MM-DD" format.
+
+    existing_min : Optional[pd.Timestamp]
+        Earliest date (or date_id) already in the date dimension, None when it is empty.
+
+    existing_max : Optional[pd.Timestamp]
+        Latest date (or date_id) already in the date dimension, None when it is empty.
+
+    freq : str
+        Frequency of date intervals (default is "H" for hourly).
+
+    Returns
+    -------
+    ranges: List[Tuple[pd.Timestamp, pd.Timestamp]]
+        Inclusive (start, end) ranges to generate.
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if existing_min is None or existing_max is None:
+        return [(start, end)] if start <= end else []
+    existing_min, existing_max = pd.Timestamp(existing_min), pd.Timestamp(existing_max)
+    step = pd.tseries.frequencies.to_offset(freq)
+    ranges = []
+    if start < existing_min:
+        ranges.append((start, min(end, existing_min - step)))
+    if end > existing_max:
+        ranges.append((max(start, existing_max + step), end))
+    return [(lower, upper) for lower, upper in ranges if lower <= upper]
+
+
+class SourceCollector:
+    """
+    Collects DataFrames from several sources and combines them in a single
+    concatenation, tagging every row with its source label as a categorical.
+
+    parameters
+    ----------
+    label_column : str
+        Name of the column holding the source label of every row.
+    """
+
+    def __init__(self, label_column: str) -> None:
+        self.label_column = label_column
+        self._labels: List[str] = []
+        self._frames: List[pd.DataFrame] = []
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def add(self, label: str, df: pd.DataFrame) -> None:
+        """Add the DataFrame extracted from the source named label."""
+        self._labels.append(label)
+        self._frames.append(df)
+
+    def _unify_categories(self) -> None:
+        """
+        Give the categorical columns shared by all collected DataFrames the same
+        categories, in place, so they stay categorical once concatenated.
+        """
+        for column in self._frames[0].columns:
+            dtypes = [frame[column].dtype if column in frame else None for frame in self._frames]
+            if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+                continue
+            categories = pd.unique(np.concatenate([dtype.categories.to_numpy() for dtype in dtypes]))
+            for frame in self._frames:
+                frame[column] = frame[column].cat.set_categories(categories)
+
+    def combine(self) -> pd.DataFrame:
+        """
+        Concatenate all collected DataFrames once.
+
+        Returns
+        -------
+        df: pd.DataFrame
+            DataFrame containing the rows of every source with the label column
+            added as a categorical built from per source codes.
+        """
+        if not self._frames:
+            return pd.DataFrame(columns=[self.label_column])
+        self._unify_categories()
+        df = pd.concat(self._frames, axis=0, ignore_index=True)
+        categories = pd.unique(np.asarray(self._labels, dtype=object))
+        codes = pd.Index(categories).get_indexer(self._labels)
+        lengths = [len(frame) for frame in self._frames]
+        df[self.label_column] = pd.Categorical.from_codes(
+            np.repeat(codes, lengths), categories=categories
+        )
+        return df
+
+
+def log_failure_cases(error: pa.errors.SchemaErrors, name: str, limit: int = 20) -> None:
+    """Log the failed columns and checks of a validation error with the source row numbers of the first failures."""
+    error_df = error.failure_cases
+    errors = list(dict.fromkeys(zip(error_df.column, error_df.check)))
+    rows = error_df["index"].dropna().unique()
+    logger.error(
+        "Schema validation failed for columns %s in %s file, %s failing rows, first source rows %s",
+        errors,
+        name,
+        len(rows),
+        rows[:limit].tolist(),
+        exc_info=True,
+    )
+
+
+def validate_or_quarantine(
+    df: pd.DataFrame, schema: pa.DataFrameSchema, name: str, validation: Optional[Dict] = None
+) -> pd.DataFrame:
+    """
+    Validates df with validate_frame. When the on_error validation option is
+    "quarantine", the rows failing validation are removed from df and sent to the
+    active quarantine instead of failing the whole source.
+
+    parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame to validate.
+
+    schema : pa.DataFrameSchema
+        This is the pandera DataFrameSchema object.
+
+    name : str
+        Name of the source of df.
+
+    validation : Optional[Dict]
+        Options of validate_frame and on_error, "raise" (default) or "quarantine".
+
+    Returns
+    -------
+    df: pd.DataFrame
+        DataFrame containing the validated rows.
+    """
+    validation = dict(validation or {})
+    on_error = validation.pop("on_error", "raise")
+    try:
+        return validate_frame(df, schema, **validation)
+    except pa.errors.SchemaErrors as e:
+        if on_error != "quarantine":
+            raise
+        good_df, rejects = split_failures(df, e, name)
+        logger.warning("Quarantined %s of %s rows of %s failing validation", len(df) - len(good_df), len(df), name)
+        quarantine_rejects(rejects)
+        return good_df
+
+
+def source_bytes(parameters: Dict) -> Optional[int]:
+    """Return the size in bytes of the file read by a CSV source, None for other sources."""
+    path = parameters.get("pandas_kwargs", {}).get("filepath_or_buffer")
+    if isinstance(path, str) and os.path.isfile(path):
+        return os.path.getsize(path)
+    return None
 
 
 def get_cocktail_by_glass(
-    parameters: Dict, glass_list: List[str], extract_func: Callable
+    parameters: Dict, glass_list: List[str], extract_func: Callable, max_workers: int = 1
 ) -> pd.DataFrame:
     """
     get list of cocktails based on the glass type from the API
@@ -107,25 +326,37 @@ def get_cocktail_by_glass(
     extract_func : Callable
         This is the APIExtractor class.
 
+    max_workers : int
+        Maximum number of concurrent requests (default is 1, fetch sequentially).
+
     Returns
     -------
     df: pd.DataFrame
         DataFrame containing cocktails by glass type.
     """
-    df = pd.DataFrame(columns=["glass", "drink"])
-    for glass in glass_list:
-        current_param = copy.deepcopy(parameters)
-        current_param["request_obj"]["url"] = current_param["request_obj"]["url"].format(glass=glass)
-        temp = extract_func(**current_param).fetch_data()
-        temp["glass"] = glass
-        df = pd.concat([df, temp], axis=0)
-    return df
+
+    def fetch(glass: str) -> pd.DataFrame:
+        request_obj = dict(parameters["request_obj"], url=parameters["request_obj"]["url"].format(glass=glass))
+        with measure("extract", parameters["name"]) as metrics:
+            df = extract_func(**dict(parameters, request_obj=request_obj, session=session)).fetch_data()
+            metrics.rows_out = len(df)
+        return df
+
+    collector = SourceCollector(label_column="glass")
+    workers = max(max_workers, 1)
+    with create_session(pool_size=workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        for glass, df in zip(glass_list, executor.map(fetch, glass_list)):
+            collector.add(glass, df)
+    if not len(collector):
+        return pd.DataFrame(columns=["glass", "drink"])
+    return collector.combine()
 
 
 def extract_and_validate(
     parameters: Dict,
     extract_func: Callable,
     schema: Optional[pa.DataFrameSchema] = None,
+    staging_cache: Optional[StagingCache] = None,
 ) -> pd.DataFrame:
     """
     Extracts the data specification in the parameters Dict using the
@@ -134,7 +365,8 @@ def extract_and_validate(
     parameters
     ----------
     parameters : Dict
-        This is the Parameters for the extract_func.
+        This is the Parameters for the extract_func, with the optional validation
+        options of validate_frame (mode, sample_size, chunk_rows).
 
     extract_func : Callable
         This is the extract function which can be a class of  of (CSVExtractor| APIExtractor).
@@ -142,22 +374,170 @@ def extract_and_validate(
     schema : pa.DataFrameSchema
         This is the pandera DataFrameSchema object.
 
+    staging_cache : Optional[StagingCache]
+        Columnar cache the validated data of CSV sources is written to, and read from
+        instead of extracting and validating the file again while it is unchanged.
+
     Returns
     -------
     pd.DataFrame
         DataFrame containing extracted and validated data.
 
     """
+    key = source_key(parameters) if staging_cache is not None else None
+    if key is not None:
+        with measure("cache_read", parameters["name"]) as metrics:
+            cached_df = staging_cache.read(parameters["name"], key)
+            metrics.rows_out = None if cached_df is None else len(cached_df)
+        if cached_df is not None:
+            return cached_df
+
+    parameters, validation = validation_options(parameters)
     try:
-        df = extract_func(**parameters).fetch_data()
-        if schema is None:
-            return df
-        validated_df = schema.validate(df, lazy=True)
-        return validated_df
+        with measure("extract", parameters["name"]) as metrics:
+            df = extract_func(**parameters).fetch_data()
+            metrics.rows_out = len(df)
+            metrics.bytes_read = source_bytes(parameters)
+        if schema is not None:
+            with measure("validate", parameters["name"]) as metrics:
+                metrics.rows_in = len(df)
+                df = validate_or_quarantine(df, schema, parameters["name"], validation)
+                metrics.rows_out = len(df)
     except pa.errors.SchemaErrors as e:
-        error_df = e.failure_cases
-        errors = list(zip(error_df.column, error_df.check))
-        logger.error(
-            "Schema validation failed for columns %s in %s file", errors, parameters["name"] , exc_info=True
-        )
+        log_failure_cases(e, parameters["name"])
         raise e
+
+    if key is not None:
+        try:
+            with measure("cache_write", parameters["name"]) as metrics:
+                metrics.rows_in = len(df)
+                staging_cache.write(parameters["name"], key, df)
+        except OSError:
+            logger.warning("Writing %s to the staging cache failed", parameters["name"], exc_info=True)
+    return df
+
+
+def extract_and_validate_chunks(
+    parameters: Dict,
+    extract_func: Callable,
+    schema: Optional[pa.DataFrameSchema] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams the data specification in the parameters Dict chunk by chunk
+    using the fetch_chunks method of the extract_func and validates every
+    chunk with the schema before yielding it.
+
+    parameters
+    ----------
+    parameters : Dict
+        This is the Parameters for the extract_func, including the optional chunksize
+        and validation options.
+
+    extract_func : Callable
+        This is the extract function which must provide a fetch_chunks method (CSVExtractor).
+
+    schema : pa.DataFrameSchema
+        This is the pandera DataFrameSchema object.
+
+    Yields
+    ------
+    pd.DataFrame
+        DataFrame containing one chunk of extracted and validated data.
+    """
+    parameters, validation = validation_options(parameters)
+    try:
+        chunks = extract_func(**parameters).fetch_chunks()
+        bytes_read = source_bytes(parameters)
+        while True:
+            # every chunk is measured on its own, so the time spent by the consumer is not counted
+            with measure("extract", parameters["name"]) as metrics:
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    metrics.rows_out = len(chunk)
+                    metrics.bytes_read, bytes_read = bytes_read, None
+            if chunk is None:
+                return
+            if schema is None:
+                yield chunk
+                continue
+            with measure("validate", parameters["name"]) as metrics:
+                metrics.rows_in = len(chunk)
+                chunk = validate_or_quarantine(chunk, schema, parameters["name"], validation)
+                metrics.rows_out = len(chunk)
+            yield chunk
+    except pa.errors.SchemaErrors as e:
+        log_failure_cases(e, parameters["name"])
+        raise e
+
+
+def extract_sources(
+    sources: List[Dict],
+    extract_func: Callable,
+    schema: Optional[pa.DataFrameSchema] = None,
+    workers: int = 1,
+    staging_cache: Optional[StagingCache] = None,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Runs extract_and_validate for every source in the sources list and yields
+    the results as they complete. When workers is greater than one the sources
+    are extracted in parallel on a process pool.
+
+    parameters
+    ----------
+    sources : List[Dict]
+        List of Parameters for the extract_func, one per source.
+
+    extract_func : Callable
+        This is the extract function which can be a class of  of (CSVExtractor| APIExtractor).
+
+    schema : pa.DataFrameSchema
+        This is the pandera DataFrameSchema object.
+
+    workers : int
+        Maximum number of worker processes (default is 1, extract sequentially).
+
+    staging_cache : Optional[StagingCache]
+        Columnar cache of the validated data of the sources, see extract_and_validate.
+
+    Yields
+    ------
+    Tuple[str, pd.DataFrame]
+        The source name and the DataFrame containing its extracted and validated data.
+    """
+    if workers <= 1 or len(sources) <= 1:
+        for parameters in sources:
+            yield parameters["name"], extract_and_validate(parameters, extract_func, schema, staging_cache)
+        return
+
+    # forkserver avoids forking a process whose other threads may hold locks (e.g. logging)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["utils.custom"])
+    else:
+        context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(sources)), mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                _measured_extract_and_validate, parameters, extract_func, schema, staging_cache
+            ): parameters["name"]
+            for parameters in sources
+        }
+        for future in as_completed(futures):
+            df, records, rejects = future.result()
+            if active_report() is not None:
+                active_report().extend(records)
+            for reject_df in rejects:
+                quarantine_rejects(reject_df)
+            yield futures[future], df
+
+
+def _measured_extract_and_validate(
+    parameters: Dict,
+    extract_func: Callable,
+    schema: Optional[pa.DataFrameSchema] = None,
+    staging_cache: Optional[StagingCache] = None,
+) -> Tuple[pd.DataFrame, List[Dict], List[pd.DataFrame]]:
+    """Runs extract_and_validate in a worker process and returns its result with the metrics and rejects recorded there."""
+    with recording(RunReport()) as report, quarantining(Quarantine()) as quarantine:
+        df = extract_and_validate(parameters, extract_func, schema, staging_cache)
+    return df, report.records(), quarantine.frames
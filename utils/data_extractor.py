@@ -1,11 +1,129 @@
+import io
+import os
+import json
+import time
+import hashlib
 import logging
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional, Any as AnyType
+from typing import List, Dict, Iterator, Optional, Any as AnyType
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+from utils.normalize import normalization_plan, normalize_frame
+from utils.csv_engines import read_csv
 
 logger = logging.getLogger(__name__)
 
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """
+    Create a requests Session with a keep-alive connection pool large enough
+    to be shared by pool_size concurrent requests.
+
+    parameters
+    ----------
+    pool_size : int
+        Maximum number of pooled connections per host.
+
+    Returns
+    -------
+    session: requests.Session
+        Session with pooled http and https adapters.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ResponseCache:
+    """
+    On-disk cache of JSON API responses keyed by the request url and params,
+    with a time to live, ETag/Last-Modified revalidation and least recently
+    used eviction once the cache directory grows beyond max_bytes.
+
+    parameters
+    ----------
+    directory : str
+        Directory where the cached responses are stored.
+
+    ttl : float
+        Seconds a cached response is served without contacting the API.
+
+    max_bytes : int
+        Maximum total size of the cached responses on disk.
+    """
+
+    def __init__(self, directory: str, ttl: float = 3600, max_bytes: int = 50 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, request_obj: Dict[AnyType, AnyType]) -> str:
+        """Return the cache key of a request from its url and params."""
+        identity = {"url": request_obj["url"], "params": request_obj.get("params")}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, AnyType]]:
+        """Return the cached entry for key, marking it as recently used, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry: Dict[str, AnyType]) -> bool:
+        """Check if the entry is younger than the time to live."""
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def set(
+        self, key: str, payload: AnyType, etag: Optional[str] = None, last_modified: Optional[str] = None
+    ) -> Dict[str, AnyType]:
+        """Store the payload of a response under key and evict old entries if needed."""
+        entry = {"stored_at": time.time(), "etag": etag, "last_modified": last_modified, "payload": payload}
+        path = self._path(key)
+        # one temporary file per writing thread, get_cocktail_by_glass stores responses from a thread pool
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, path)
+        self.evict()
+        return entry
+
+    def refresh(self, key: str, entry: Dict[str, AnyType]) -> Dict[str, AnyType]:
+        """Restart the time to live of an entry the API confirmed as unchanged."""
+        return self.set(key, entry["payload"], entry.get("etag"), entry.get("last_modified"))
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+
 class BaseExtractor(ABC):
     """
     This class defines the common interface for all data extraction methods.
@@ -36,6 +154,37 @@ class CSVExtractor(BaseExtractor):
 
     drop_columns : Optional[List[AnyType]]
         List of columns that should be dropped from the dataframe.
+
+    normalize_columns : Optional[Dict[str, List[str]]]
+        Names of the normalizers (strip, collapse_spaces, nfc, lower, upper, title)
+        to apply to the distinct values of each column.
+
+    chunksize : Optional[int]
+        Number of rows per chunk when the file is read with fetch_chunks.
+
+    watermark_column : Optional[str]
+        Column compared with the watermark, after columns are renamed.
+
+    watermark : Optional[AnyType]
+        Only rows with a watermark_column value greater than this are kept.
+
+    engine : str
+        Reader of fetch_data: "pandas" (default), or "pyarrow" / "polars" for a
+        multithreaded reader parsing the dates natively. It falls back to pandas
+        when it is not installed or does not support the pandas_kwargs. Chunks are
+        always read with pandas.
+
+    dtype_backend : str
+        "numpy" (default) or "pyarrow" to return Arrow-backed columns.
+
+    append_only : bool
+        The file is only ever appended to, so the rows of an earlier read can be
+        skipped by byte_offset (default False).
+
+    byte_offset : Optional[int]
+        Size of the file when it was last read. For append_only files, only the bytes
+        appended since then (and the header line) are parsed. The file is read in
+        full when it did not grow or the offset does not fall on a line boundary.
     """
 
     def __init__(
@@ -45,12 +194,64 @@ class CSVExtractor(BaseExtractor):
         capitalize_columns: Optional[List[str]] = None,
         columns_mapping: Optional[Dict[AnyType, AnyType]] = None,
         drop_columns: Optional[List[AnyType]] = None,
+        normalize_columns: Optional[Dict[str, List[str]]] = None,
+        chunksize: Optional[int] = None,
+        watermark_column: Optional[str] = None,
+        watermark: Optional[AnyType] = None,
+        engine: str = "pandas",
+        dtype_backend: str = "numpy",
+        append_only: bool = False,
+        byte_offset: Optional[int] = None,
     ) -> None:
         self.name = name
         self.pandas_kwargs = pandas_kwargs
         self.capitalize_columns = capitalize_columns
         self.columns_mapping = columns_mapping
         self.drop_columns = drop_columns
+        self.normalize_columns = normalize_columns
+        self.chunksize = chunksize
+        self.watermark_column = watermark_column
+        self.watermark = watermark
+        self.engine = engine
+        self.dtype_backend = dtype_backend
+        self.append_only = append_only
+        self.byte_offset = byte_offset
+
+    def _read_kwargs(self) -> Dict[AnyType, AnyType]:
+        """
+        Return the pandas_kwargs reading the file, reading only the header line and
+        the bytes appended after byte_offset when the file is append_only.
+        """
+        if not self.append_only or not self.byte_offset:
+            return self.pandas_kwargs
+        path = self.pandas_kwargs["filepath_or_buffer"]
+        with open(path, "rb") as file:
+            header = b"" if self.pandas_kwargs.get("header", "infer") is None else file.readline()
+            size = os.fstat(file.fileno()).st_size
+            if len(header) <= self.byte_offset < size:
+                file.seek(self.byte_offset - 1)
+                if file.read(1) == b"\n":
+                    appended = file.read()
+                    logger.info("Reading the %s bytes appended to %s", len(appended), path)
+                    return dict(self.pandas_kwargs, filepath_or_buffer=io.BytesIO(header + appended))
+        logger.info("%s was not only appended to since it was last read, reading it in full", path)
+        return self.pandas_kwargs
+
+    def _transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply the configured column drops, renames, watermark filter,
+        capitalization and de-duplication to a DataFrame read from the CSV file.
+        """
+        if self.drop_columns:
+            df.drop(columns=self.drop_columns, inplace=True)
+        if self.columns_mapping:
+            df.rename(columns=self.columns_mapping, inplace=True)
+        if self.watermark_column and self.watermark is not None:  # keep rows newer than the watermark
+            df = df[df[self.watermark_column] > self.watermark].copy()
+        # normalize (e.g. capitalize all words in) the specified columns, once per distinct value
+        normalize_frame(df, normalization_plan(self.capitalize_columns, self.normalize_columns))
+        df.drop_duplicates(inplace=True)  # remove duplicates
+        return df
 
     def fetch_data(self) -> Optional[pd.DataFrame]:
         """
@@ -68,14 +269,7 @@ class CSVExtractor(BaseExtractor):
                 self.name,
                 self.pandas_kwargs["filepath_or_buffer"],
             )
-            df = pd.read_csv(**self.pandas_kwargs)
-            if self.drop_columns:
-                df.drop(columns=self.drop_columns, inplace=True)
-            if self.columns_mapping:
-                df.rename(columns=self.columns_mapping, inplace=True)
-            if self.capitalize_columns:  # capitalize all words in the specified columns
-                df[self.capitalize_columns] = df[self.capitalize_columns].map(str.title)
-            df.drop_duplicates(inplace=True)  # remove duplicates
+            df = self._transform(read_csv(self._read_kwargs(), self.engine, self.dtype_backend))
             logger.info(
                 "Finished getting %s data from  %s",
                 self.name,
@@ -90,6 +284,45 @@ class CSVExtractor(BaseExtractor):
             )
             raise e
 
+    def fetch_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        This method reads data from a CSV file in chunks of ``chunksize`` rows
+        and yields each transformed chunk as a DataFrame, so only one chunk is
+        held in memory at a time. Duplicates are only removed within a chunk,
+        the transaction merges drop the ones spanning chunks.
+        When no chunksize is configured the whole file is yielded as one chunk.
+
+        Yields
+        ------
+        df: pd.DataFrame
+            DataFrame containing one chunk of extracted data.
+        """
+        if not self.chunksize:
+            yield self.fetch_data()
+            return
+        try:
+            logger.info(
+                "Streaming %s data from %s in chunks of %s rows",
+                self.name,
+                self.pandas_kwargs["filepath_or_buffer"],
+                self.chunksize,
+            )
+            with pd.read_csv(**self._read_kwargs(), chunksize=self.chunksize) as reader:
+                for chunk in reader:
+                    yield self._transform(chunk)
+            logger.info(
+                "Finished streaming %s data from %s",
+                self.name,
+                self.pandas_kwargs["filepath_or_buffer"],
+            )
+        except Exception as e:
+            logger.error(
+                "Error streaming %s data with the specified configuration",
+                self.name,
+                exc_info=True,
+            )
+            raise e
+
 
 class APIExtractor(BaseExtractor):
     """
@@ -114,6 +347,16 @@ class APIExtractor(BaseExtractor):
 
     drop_columns : Optional[List[AnyType]]
         List of columns that should be dropped from the dataframe.
+
+    normalize_columns : Optional[Dict[str, List[str]]]
+        Names of the normalizers (strip, collapse_spaces, nfc, lower, upper, title)
+        to apply to the distinct values of each column.
+
+    session : Optional[requests.Session]
+        Shared session used to reuse keep-alive connections across requests.
+
+    cache : Optional[ResponseCache]
+        On-disk response cache consulted before the API is called.
     """
 
     def __init__(
@@ -124,6 +367,9 @@ class APIExtractor(BaseExtractor):
         capitalize_columns: Optional[List[str]] = None,
         columns_mapping: Optional[Dict[AnyType, AnyType]] = None,
         drop_columns: Optional[List[AnyType]] = None,
+        normalize_columns: Optional[Dict[str, List[str]]] = None,
+        session: Optional[requests.Session] = None,
+        cache: Optional[ResponseCache] = None,
     ):
         self.name = name
         self.request_obj = request_obj
@@ -131,6 +377,53 @@ class APIExtractor(BaseExtractor):
         self.capitalize_columns = capitalize_columns
         self.columns_mapping = columns_mapping
         self.drop_columns = drop_columns
+        self.normalize_columns = normalize_columns
+        self.session = session
+        self.cache = cache
+
+    def _request(self) -> AnyType:
+        """
+        Return the decoded JSON response of the API, served from the cache while
+        it is fresh, revalidated with ETag/Last-Modified once it expires and
+        served stale when the API cannot be reached.
+        """
+        getter = requests.get if self.session is None else self.session.get
+        if self.cache is None:
+            return getter(**self.request_obj).json()
+
+        key = self.cache.key(self.request_obj)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            logger.info("Using cached %s response for %s", self.name, self.request_obj["url"])
+            return entry["payload"]
+
+        request_obj = dict(self.request_obj)
+        if entry is not None:
+            headers = dict(request_obj.get("headers") or {})
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            request_obj["headers"] = headers
+        try:
+            resp = getter(**request_obj)
+            if resp.status_code == 304 and entry is not None:
+                logger.info("Cached %s response for %s is unchanged", self.name, self.request_obj["url"])
+                return self.cache.refresh(key, entry)["payload"]
+            resp.raise_for_status()
+            payload = resp.json()
+        except requests.RequestException:
+            if entry is None:
+                raise
+            logger.warning(
+                "Request for %s failed, using stale cached response for %s",
+                self.name,
+                self.request_obj["url"],
+                exc_info=True,
+            )
+            return entry["payload"]
+        self.cache.set(key, payload, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        return payload
 
     def fetch_data(self) -> Optional[pd.DataFrame]:
         """
@@ -144,16 +437,15 @@ class APIExtractor(BaseExtractor):
         """
         logger.info("Getting %s data from %s", self.name, self.request_obj["url"])
         try:
-            resp = requests.get(**self.request_obj)
-            resp = resp.json()[self.data_field]
+            resp = self._request()[self.data_field]
             df = pd.DataFrame(resp)
             if self.drop_columns:
                 df.drop(columns=self.drop_columns, inplace=True)
             if self.columns_mapping:
                 df.rename(columns=self.columns_mapping, inplace=True)
-            df.drop_duplicates(inplace=True)  # remove duplicates
-            if self.capitalize_columns:  # capitalize all words in the specified columns
-                df[self.capitalize_columns] = df[self.capitalize_columns].map(str.title)
+            # normalize (e.g. capitalize all words in) the specified columns, once per distinct value
+            normalize_frame(df, normalization_plan(self.capitalize_columns, self.normalize_columns))
+            df.drop_duplicates(inplace=True)  # remove duplicates, including the ones normalization made
             logger.info(
                 "Finished getting %s data from %s", self.name, self.request_obj["url"]
             )
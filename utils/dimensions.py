@@ -0,0 +1,121 @@
+import logging
+from typing import Dict
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from utils.sql import Bar, Cocktail, Glass
+
+logger = logging.getLogger(__name__)
+
+# table model and natural key column of every dimension
+DIMENSIONS = {
+    "bars": (Bar, "bar"),
+    "glasses": (Glass, "glass"),
+    "cocktails": (Cocktail, "drink"),
+}
+
+
+class DimensionKeyCache:
+    """
+    In-memory name -> surrogate id maps of the bars, glasses and cocktails
+    dimensions, each loaded from the database once, used to replace names with
+    integer ids in staging frames without joining the dimension tables in SQL.
+
+    parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Connection to the database holding the dimension tables.
+    """
+
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self.keys: Dict[str, Dict[str, int]] = {}
+
+    def _load(self, dimension: str) -> Dict[str, int]:
+        if dimension not in self.keys:
+            model, column = DIMENSIONS[dimension]
+            if dimension == "cocktails":
+                # a drink served in several glasses resolves to its cocktail in the first glass by name,
+                # as in sql.select_drink_cocktail, sorted in Python like its C collation
+                query = select(Cocktail.drink, Cocktail.id, Glass.glass).join(Glass, Glass.id == Cocktail.glass_id)
+                rows = sorted(self.connection.execute(query).all(), key=lambda row: row.glass, reverse=True)
+                self.keys[dimension] = {drink: cocktail_id for drink, cocktail_id, _ in rows}
+            else:
+                query = select(getattr(model, column), model.id)
+                self.keys[dimension] = dict(self.connection.execute(query).all())
+            logger.info("Loaded %s %s keys", len(self.keys[dimension]), dimension)
+        return self.keys[dimension]
+
+    def add(self, dimension: str, names) -> None:
+        """Insert the names missing from a dimension table in bulk and cache their new ids."""
+        keys = self._load(dimension)
+        missing = sorted({name for name in names if name not in keys})
+        if not missing:
+            return
+        model, column = DIMENSIONS[dimension]
+        self.connection.execute(model.__table__.insert(), [{column: name} for name in missing])
+        query = select(getattr(model, column), model.id).where(getattr(model, column).in_(missing))
+        keys.update(self.connection.execute(query).all())
+        logger.info("Added %s new members to %s", len(missing), dimension)
+
+    def ids(self, dimension: str, names: pd.Series, add_missing: bool = False) -> pd.Series:
+        """
+        Map a Series of names to the surrogate ids of a dimension, looking up every
+        distinct name once.
+
+        parameters
+        ----------
+        dimension : str
+            One of bars, glasses or cocktails.
+
+        names : pd.Series
+            Names to map, e.g. a categorical column of a staging frame.
+
+        add_missing : bool
+            Insert the names missing from the dimension table first (default is False,
+            missing names are mapped to <NA>). Cocktails can not be added without their glass.
+
+        Returns
+        -------
+        ids: pd.Series
+            Nullable integer ids aligned with names.
+        """
+        codes, uniques = pd.factorize(names)
+        if add_missing:
+            self.add(dimension, uniques)
+        keys = self._load(dimension)
+        unique_ids = pd.array([keys.get(name) for name in uniques], dtype="Int64")
+        ids = unique_ids.take(codes, allow_fill=True)
+        return pd.Series(ids, index=names.index, name=f"{DIMENSIONS[dimension][1]}_id")
+
+
+def key_transactions(df: pd.DataFrame, cache: DimensionKeyCache) -> pd.DataFrame:
+    """
+    Replace the location and drink names of a transaction frame with the bar and
+    cocktail ids. Bars missing from the bars table are added, transactions of drinks
+    that are not a known cocktail are dropped, as the transaction merge did.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        DataFrame with the bar_id, cocktail_id, amount and time columns.
+    """
+    keyed = pd.DataFrame(
+        {
+            "bar_id": cache.ids("bars", df["location"], add_missing=True),
+            "cocktail_id": cache.ids("cocktails", df["drink"]),
+            "amount": df["amount"],
+            "time": df["time"],
+        }
+    )
+    unknown = keyed["cocktail_id"].isna().to_numpy()
+    if unknown.any():
+        logger.warning(
+            "Dropping %s transactions of unknown drinks %s",
+            int(unknown.sum()),
+            sorted(map(str, pd.unique(df["drink"].to_numpy()[unknown])))[:20],
+        )
+        keyed = keyed[~unknown]
+    keyed["bar_id"] = keyed["bar_id"].astype(np.int32)
+    keyed["cocktail_id"] = keyed["cocktail_id"].astype(np.int32)
+    return keyed
@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Any as AnyType
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_active_report: Optional["RunReport"] = None
+
+
+def ru_maxrss_mb(ru_maxrss: int, platform: str = sys.platform) -> float:
+    """Convert a ru_maxrss to MiB, it is in bytes on macOS and in KiB on Linux and the BSDs."""
+    return ru_maxrss / (1024 * 1024 if platform == "darwin" else 1024)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of the process so far, in MiB."""
+    if resource is None:
+        return None
+    return ru_maxrss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+class StageMetrics:
+    """
+    Measurements of one pipeline step. rows_in, rows_out and bytes_read are set
+    by the measured code, the timings and memory by measure.
+
+    parameters
+    ----------
+    stage : str
+        Kind of step, e.g. extract, validate, stage_load, merge or task.
+
+    name : str
+        Source, table or task the step works on.
+    """
+
+    fields = (
+        "stage", "name", "status", "started_at", "calls", "wall_seconds", "cpu_seconds",
+        "rows_in", "rows_out", "bytes_read", "peak_rss_mb",
+    )
+
+    def __init__(self, stage: str, name: str) -> None:
+        self.stage = stage
+        self.name = name
+        self.status = "running"
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.calls = 1
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.bytes_read: Optional[int] = None
+        self.peak_rss_mb: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, AnyType]:
+        return {field: getattr(self, field) for field in self.fields}
+
+    def merge(self, other: "StageMetrics") -> None:
+        """Accumulate the measurements of another call of the same step, e.g. the next chunk."""
+        self.calls += other.calls
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+        for field in ("rows_in", "rows_out", "bytes_read"):
+            if getattr(other, field) is not None:
+                setattr(self, field, (getattr(self, field) or 0) + getattr(other, field))
+        if other.peak_rss_mb is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, other.peak_rss_mb)
+        if other.status == "failed":
+            self.status = "failed"
+
+
+class RunReport:
+    """
+    Collects the StageMetrics of a pipeline run, merging repeated calls of the
+    same step, and writes them as a JSON run report or into a metrics table.
+
+    parameters
+    ----------
+    run_id : Optional[str]
+        Identifier of the run (default is a random id).
+    """
+
+    def __init__(self, run_id: Optional[str] = None) -> None:
+        self.run_id = run_id or uuid.uuid4().hex
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.stages: Dict[tuple, StageMetrics] = {}
+        self.extra: Dict[str, AnyType] = {}
+        self._lock = threading.Lock()
+
+    def add(self, metrics: StageMetrics) -> None:
+        with self._lock:
+            key = (metrics.stage, metrics.name)
+            if key in self.stages:
+                self.stages[key].merge(metrics)
+            else:
+                self.stages[key] = metrics
+
+    def extend(self, records: List[Dict[str, AnyType]]) -> None:
+        """Add the records of another report, e.g. measured in a worker process."""
+        for record in records:
+            metrics = StageMetrics(record["stage"], record["name"])
+            for field, value in record.items():
+                setattr(metrics, field, value)
+            self.add(metrics)
+
+    def records(self) -> List[Dict[str, AnyType]]:
+        with self._lock:
+            return [metrics.to_dict() for metrics in self.stages.values()]
+
+    def to_dict(self) -> Dict[str, AnyType]:
+        finished_at = self.finished_at or datetime.now(timezone.utc)
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": finished_at.isoformat(),
+            "wall_seconds": (finished_at - self.started_at).total_seconds(),
+            "peak_rss_mb": peak_rss_mb(),
+            **self.extra,
+            "stages": self.records(),
+        }
+
+    def write_json(self, directory: str) -> str:
+        """Write the report to run_<started_at>_<run_id>.json in directory and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"run_{self.started_at:%Y%m%dT%H%M%S}_{self.run_id}.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+        logger.info("Run report written to %s", path)
+        return path
+
+    def write_table(self, connection, table) -> None:
+        """Insert one row per measured step into the metrics table."""
+        rows = [
+            dict(record, run_id=self.run_id, started_at=datetime.fromisoformat(record["started_at"]))
+            for record in self.records()
+        ]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+
+def active_report() -> Optional[RunReport]:
+    """Return the run report measured steps are recorded into, if any."""
+    return _active_report
+
+
+@contextmanager
+def recording(report: RunReport) -> Iterator[RunReport]:
+    """Record every measured step into report while the context is active."""
+    global _active_report
+    previous, _active_report = _active_report, report
+    try:
+        yield report
+    finally:
+        report.finished_at = datetime.now(timezone.utc)
+        _active_report = previous
+
+
+@contextmanager
+def measure(stage: str, name: str) -> Iterator[StageMetrics]:
+    """
+    Measure the wall time, thread CPU time and peak RSS of the wrapped step and
+    add it to the active run report, if any. The step can set rows_in,
+    rows_out and bytes_read on the yielded StageMetrics.
+    """
+    metrics = StageMetrics(stage, name)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield metrics
+        metrics.status = "ok"
+    except BaseException:
+        metrics.status = "failed"
+        raise
+    finally:
+        metrics.wall_seconds = time.perf_counter() - wall
+        metrics.cpu_seconds = time.thread_time() - cpu
+        metrics.peak_rss_mb = peak_rss_mb()
+        if _active_report is not None:
+            _active_report.add(metrics)
+
@@ -0,0 +1,100 @@
+import unicodedata
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+def _nfc(value: str) -> str:
+    return unicodedata.normalize("NFC", value)
+
+
+def _collapse_spaces(value: str) -> str:
+    return " ".join(value.split())
+
+
+# Normalizers that can be configured per column, applied in the configured order.
+NORMALIZERS: Dict[str, Callable[[str], str]] = {
+    "strip": str.strip,
+    "collapse_spaces": _collapse_spaces,
+    "nfc": _nfc,
+    "lower": str.lower,
+    "upper": str.upper,
+    "title": str.title,
+}
+
+
+def normalization_plan(
+    capitalize_columns: Optional[List[str]] = None,
+    normalize_columns: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, List[str]]:
+    """
+    Combine the capitalize_columns and normalize_columns options of an extractor
+    into a single column -> normalizers mapping.
+
+    parameters
+    ----------
+    capitalize_columns : Optional[List[str]]
+        List of columns that should be title-cased.
+
+    normalize_columns : Optional[Dict[str, List[str]]]
+        Names of the NORMALIZERS to apply to each column, in order.
+
+    Returns
+    -------
+    plan: Dict[str, List[str]]
+        Normalizers to apply per column.
+    """
+    plan = {column: list(names) for column, names in (normalize_columns or {}).items()}
+    for column in capitalize_columns or []:
+        names = plan.setdefault(column, [])
+        if "title" not in names:
+            names.append("title")
+    unknown = {name for names in plan.values() for name in names} - set(NORMALIZERS)
+    if unknown:
+        raise ValueError(f"Unknown normalizers {sorted(unknown)}, expected one of {sorted(NORMALIZERS)}")
+    return plan
+
+
+def normalize_series(series: pd.Series, normalizers: List[str]) -> pd.Series:
+    """
+    Apply the normalizers to the distinct values of series only and remap every
+    row to its normalized value. Categorical series stay categorical, with
+    categories merged when they normalize to the same value; missing values
+    are kept as they are.
+
+    parameters
+    ----------
+    series : pd.Series
+        Series of strings to normalize.
+
+    normalizers : List[str]
+        Names of the NORMALIZERS to apply, in order.
+
+    Returns
+    -------
+    series: pd.Series
+        Normalized series with the same index and name.
+    """
+    codes, uniques = pd.factorize(series)
+    if not len(uniques):
+        return series.copy()
+    values = np.asarray(uniques, dtype=object)
+    for name in normalizers:
+        func = NORMALIZERS[name]
+        values = np.fromiter((func(value) for value in values), dtype=object, count=len(values))
+    value_codes, categories = pd.factorize(values)
+    new_codes = np.where(codes >= 0, value_codes.take(codes, mode="clip"), -1)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        data = pd.Categorical.from_codes(new_codes, categories=categories)
+    else:
+        data = np.asarray(categories, dtype=object).take(new_codes, mode="clip")
+        data[new_codes < 0] = series.to_numpy(dtype=object)[new_codes < 0]
+    return pd.Series(data, index=series.index, name=series.name)
+
+
+def normalize_frame(df: pd.DataFrame, plan: Dict[str, List[str]]) -> pd.DataFrame:
+    """Normalize the columns of df in place following a normalization_plan."""
+    for column, normalizers in plan.items():
+        if normalizers:
+            df[column] = normalize_series(df[column], normalizers)
+    return df
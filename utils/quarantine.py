@@ -0,0 +1,138 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+import pandas as pd
+import pandera as pa
+
+logger = logging.getLogger(__name__)
+
+REJECT_COLUMNS = ["source", "row", "column", "check", "failure_case", "data"]
+
+_active_quarantine: Optional["Quarantine"] = None
+
+
+def split_failures(df: pd.DataFrame, error: pa.errors.SchemaErrors, source: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split a DataFrame that failed validation into the rows passing every check and
+    one reject record per failed check of the other rows.
+
+    Failures that are not tied to rows (a missing column or a wrong dtype) cannot be
+    quarantined and the error is raised again.
+
+    parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame that failed validation, its index holds the source row numbers.
+
+    error : pa.errors.SchemaErrors
+        The validation error raised for df.
+
+    source : str
+        Name of the source of df.
+
+    Returns
+    -------
+    good_df, rejects: Tuple[pd.DataFrame, pd.DataFrame]
+        The rows passing validation and the reject records with their source, row
+        number, failed column and check, failure case and the row as JSON.
+    """
+    cases = error.failure_cases
+    if cases["index"].isna().any():
+        raise error
+    failed = df.index.isin(cases["index"].unique())
+    failed_df = df[failed]
+    data = pd.Series(
+        failed_df.to_json(orient="records", lines=True, date_format="iso", force_ascii=False).splitlines(),
+        index=failed_df.index,
+        dtype=object,
+    )
+    data = data[~data.index.duplicated()]
+    rejects = pd.DataFrame(
+        {
+            "source": source,
+            "row": cases["index"].to_numpy(),
+            "column": cases["column"].to_numpy(),
+            "check": cases["check"].to_numpy(),
+            "failure_case": cases["failure_case"].astype(str).to_numpy(),
+            "data": data.reindex(cases["index"]).to_numpy(),
+        },
+        columns=REJECT_COLUMNS,
+    )
+    return df[~failed], rejects
+
+
+class Quarantine:
+    """
+    Collects the rows rejected by validation during a run and writes them to a CSV
+    file and/or a rejects table.
+
+    parameters
+    ----------
+    run_id : Optional[str]
+        Identifier of the run written with every reject (default is the start time).
+    """
+
+    def __init__(self, run_id: Optional[str] = None) -> None:
+        self.started_at = datetime.now(timezone.utc)
+        self.run_id = run_id or f"{self.started_at:%Y%m%dT%H%M%S}"
+        self.frames: List[pd.DataFrame] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(frame) for frame in self.frames)
+
+    def add(self, rejects: pd.DataFrame) -> None:
+        if rejects.empty:
+            return
+        with self._lock:
+            self.frames.append(rejects)
+
+    def rejects(self) -> pd.DataFrame:
+        """Return every reject collected so far with the run id."""
+        with self._lock:
+            frames = list(self.frames)
+        rejects = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=REJECT_COLUMNS)
+        rejects.insert(0, "run_id", self.run_id)
+        return rejects
+
+    def write_csv(self, directory: str) -> Optional[str]:
+        """Write the rejects to rejects_<run id>.csv in directory and return its path, if there are any."""
+        if not len(self):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"rejects_{self.run_id}.csv")
+        self.rejects().to_csv(path, index=False)
+        logger.info("%s rejects written to %s", len(self), path)
+        return path
+
+    def write_table(self, connection, table) -> None:
+        """Insert the rejects into the rejects table."""
+        if len(self):
+            connection.execute(table.insert(), self.rejects().to_dict(orient="records"))
+
+
+def active_quarantine() -> Optional[Quarantine]:
+    """Return the quarantine rejected rows are collected into, if any."""
+    return _active_quarantine
+
+
+@contextmanager
+def quarantining(quarantine: Quarantine) -> Iterator[Quarantine]:
+    """Collect the rows rejected by validation into quarantine while the context is active."""
+    global _active_quarantine
+    previous, _active_quarantine = _active_quarantine, quarantine
+    try:
+        yield quarantine
+    finally:
+        _active_quarantine = previous
+
+
+def quarantine_rejects(rejects: pd.DataFrame) -> None:
+    """Add rejects to the active quarantine, only logging them when there is none."""
+    if _active_quarantine is None:
+        logger.warning("%s rejects of %s dropped, no quarantine is active", len(rejects), set(rejects["source"]))
+        return
+    _active_quarantine.add(rejects)
@@ -0,0 +1,115 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Any as AnyType
+from utils.metrics import measure
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    """
+    A named pipeline stage and the names of the tasks it depends on.
+
+    parameters
+    ----------
+    name : str
+        Unique name of the task.
+
+    func : Callable[[Dict[str, AnyType]], AnyType]
+        Function running the stage. It is called with the results of the tasks
+        completed so far, keyed by task name.
+
+    depends_on : Iterable[str]
+        Names of the tasks that must complete before this one starts. Names of
+        tasks that are not scheduled in the same run are ignored.
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict[str, AnyType]], AnyType], depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+    def __repr__(self) -> str:
+        return f"Task({self.name!r}, depends_on={self.depends_on!r})"
+
+
+def run_tasks(tasks: List[Task], max_workers: int = 1) -> Dict[str, AnyType]:
+    """
+    Run the tasks of a dependency graph, starting every task as soon as the tasks
+    it depends on are completed, with up to max_workers tasks running at once on
+    a thread pool. When a task fails no new task is started, the running ones are
+    awaited and the first error is raised.
+
+    parameters
+    ----------
+    tasks : List[Task]
+        Tasks to run.
+
+    max_workers : int
+        Maximum number of tasks running concurrently (default is 1, run in sequence).
+
+    Returns
+    -------
+    results: Dict[str, AnyType]
+        Result of every task keyed by task name.
+    """
+    by_name = {task.name: task for task in tasks}
+    if len(by_name) != len(tasks):
+        raise ValueError("Task names must be unique")
+    waiting_on = {
+        task.name: {name for name in task.depends_on if name in by_name} for task in tasks
+    }
+    _check_acyclic(waiting_on)
+
+    workers = max(max_workers, 1)
+    results: Dict[str, AnyType] = {}
+    pending = [task.name for task in tasks]  # keeps the declaration order for ties
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            if error is None:
+                for name in [name for name in pending if not waiting_on[name]]:
+                    if len(running) >= workers:
+                        break
+                    pending.remove(name)
+                    logger.info("Starting task %s", name)
+                    running[executor.submit(_run_task, by_name[name], dict(results))] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("Task %s failed", name, exc_info=True)
+                    error = error or e
+                    continue
+                logger.info("Task %s completed", name)
+                for dependencies in waiting_on.values():
+                    dependencies.discard(name)
+    if error is not None:
+        if pending:
+            logger.error("Tasks not run because of the failure: %s", ", ".join(pending))
+        raise error
+    return results
+
+
+def _run_task(task: Task, results: Dict[str, AnyType]) -> AnyType:
+    """Run a task, measuring it in the active run report."""
+    with measure("task", task.name):
+        return task.func(results)
+
+
+def _check_acyclic(waiting_on: Dict[str, set]) -> None:
+    """Raise a ValueError when the dependencies contain a cycle."""
+    remaining = {name: set(dependencies) for name, dependencies in waiting_on.items()}
+    while remaining:
+        ready = [name for name, dependencies in remaining.items() if not dependencies]
+        if not ready:
+            raise ValueError(f"Tasks have cyclic dependencies: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for dependencies in remaining.values():
+            dependencies.difference_update(ready)
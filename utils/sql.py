@@ -1,7 +1,8 @@
 import os
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, UniqueConstraint, ForeignKey
-from sqlalchemy import Column, Integer, String, DateTime, DECIMAL
+from sqlalchemy import create_engine, inspect, UniqueConstraint, ForeignKey, Index
+from sqlalchemy.schema import AddConstraint
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, DECIMAL
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -10,14 +11,14 @@ class Bar(Base):
     __tablename__ = "bars"
     id = Column(Integer, primary_key=True)
     bar = Column(String, nullable=False)
-    UniqueConstraint("bar")
+    __table_args__ = (UniqueConstraint("bar", name="uq_bars_bar"),)
 
 
 class Glass(Base):
     __tablename__ = "glasses"
     id = Column(Integer, primary_key=True)
     glass = Column(String, nullable=False)
-    UniqueConstraint("glass")
+    __table_args__ = (UniqueConstraint("glass", name="uq_glasses_glass"),)
 
 
 class Cocktail(Base):
@@ -25,7 +26,11 @@ class Cocktail(Base):
     id = Column(Integer, primary_key=True)
     glass_id = Column(Integer, ForeignKey("glasses.id"), nullable=False)
     drink = Column(String, nullable=False)
-    UniqueConstraint("drink")
+    # a drink can be served in several glasses, the transactions are matched on the drink only
+    __table_args__ = (
+        UniqueConstraint("glass_id", "drink", name="uq_cocktails_glass_id_drink"),
+        Index("ix_cocktails_drink", "drink"),
+    )
 
 
 class BarStock(Base):
@@ -34,15 +39,22 @@ class BarStock(Base):
     bar_id = Column(Integer, ForeignKey("bars.id"), nullable=False)
     glass_id = Column(Integer, ForeignKey("glasses.id"), nullable=False)
     stock = Column(Integer)
+    __table_args__ = (UniqueConstraint("bar_id", "glass_id", name="uq_bar_stock_bar_id_glass_id"),)
 
 
 class Transaction(Base):
     __tablename__ = "fact_transactions"
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     bar_id = Column(Integer, ForeignKey("bars.id"), nullable=False)
     cocktail_id = Column(Integer, ForeignKey("cocktails.id"), nullable=False)
-    date = Column(DateTime, nullable=False)
+    # part of the primary key as Postgres requires it for the monthly range partitions
+    date = Column(DateTime, primary_key=True, nullable=False)
     amount = Column(DECIMAL(2), nullable=False)
+    # not unique, two sales of the same drink in the same bar can share a time
+    __table_args__ = (
+        Index("ix_fact_transactions_bar_id_cocktail_id_date", "bar_id", "cocktail_id", "date"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
 
 
 class Date(Base):
@@ -55,10 +67,100 @@ class Date(Base):
     hour = Column(Integer, nullable=False)
     year = Column(Integer, nullable=False)
     quarter = Column(Integer, nullable=False)
-    month = Column(Integer, nullable=False)
-    hour = Column(Integer, nullable=False)
+    month = Column(String, nullable=False)
+
+
+class SalesByBarCocktailHour(Base):
+    __tablename__ = "sales_bar_cocktail_hourly"
+    bar_id = Column(Integer, ForeignKey("bars.id"), primary_key=True)
+    cocktail_id = Column(Integer, ForeignKey("cocktails.id"), primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    sales = Column(BigInteger, nullable=False)
+    amount = Column(DECIMAL, nullable=False)
+
+
+class SalesByBarGlassDay(Base):
+    __tablename__ = "sales_bar_glass_daily"
+    bar_id = Column(Integer, ForeignKey("bars.id"), primary_key=True)
+    glass_id = Column(Integer, ForeignKey("glasses.id"), primary_key=True)
+    day = Column(DateTime, primary_key=True)
+    sales = Column(BigInteger, nullable=False)
+    amount = Column(DECIMAL, nullable=False)
+
+
+class RollupWatermark(Base):
+    __tablename__ = "etl_rollup_watermarks"
+    rollup = Column(String, primary_key=True)
+    # id of the last fact_transactions row added to the rollup
+    last_id = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class SourceState(Base):
+    __tablename__ = "etl_source_state"
+    source = Column(String, primary_key=True)
+    watermark = Column(DateTime)
+    file_size = Column(BigInteger)
+    file_mtime = Column(Float)
+    fingerprint = Column(String)
+    duration = Column(Float)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class RunMetric(Base):
+    __tablename__ = "etl_run_metrics"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, nullable=False, index=True)
+    stage = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    started_at = Column(DateTime(timezone=True))
+    calls = Column(Integer)
+    wall_seconds = Column(Float)
+    cpu_seconds = Column(Float)
+    rows_in = Column(BigInteger)
+    rows_out = Column(BigInteger)
+    bytes_read = Column(BigInteger)
+    peak_rss_mb = Column(Float)
+
+
+class Reject(Base):
+    __tablename__ = "etl_rejects"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, nullable=False, index=True)
+    source = Column(String, nullable=False)
+    row = Column(BigInteger)
+    column = Column(String)
+    check = Column(String)
+    failure_case = Column(String)
+    data = Column(String)
 
 
+# columns of the staging tables joined against the report tables by the merges, indexed after
+# every bulk load, keyed by the staging table config key
+STAGING_INDEXES = {
+    "transaction_table_stage": [("location",), ("drink",), ("time",)],
+    "stock_table_stage": [("bar",), ("glass_type",)],
+    "glass_table_stage": [("glass",)],
+    "cocktail_table_stage": [("glass",), ("drink",)],
+}
+
+create_staging_index = """
+CREATE INDEX IF NOT EXISTS "{index}" ON "{table}" ({columns})
+"""
+
+drop_staging_index = """
+DROP INDEX IF EXISTS "{index}"
+"""
+
+set_unlogged = """
+ALTER TABLE "{table}" SET UNLOGGED
+"""
+
+analyze_table = """
+ANALYZE "{table}"
+"""
+
 insert_bar_table = """
 MERGE INTO bars T
 USING 
@@ -72,7 +174,9 @@ WHEN NOT MATCHED THEN
 
 insert_glass_table = """
 MERGE INTO glasses T
-USING {temp_table} S
+USING 
+    (SELECT DISTINCT glass 
+    FROM {temp_table}) S
 ON T.glass = S.glass
 WHEN NOT MATCHED THEN 
 	INSERT (glass) 
@@ -82,7 +186,7 @@ WHEN NOT MATCHED THEN
 insert_cocktail_table = """
 MERGE INTO cocktails T
 USING 
-    (SELECT g.id AS glass_id , c.drink 
+    (SELECT DISTINCT g.id AS glass_id , c.drink 
     FROM {temp_table} c
     LEFT JOIN glasses g
     ON c.glass=g.glass
@@ -96,12 +200,13 @@ WHEN NOT MATCHED THEN
 insert_stock_table = """
 MERGE INTO bar_stock T
 USING 
-    (SELECT b.id AS bar_id, g.id AS glass_id, stock 
+    (SELECT b.id AS bar_id, g.id AS glass_id, SUM(stock) AS stock 
     FROM {temp_table} ts
     LEFT JOIN bars b
     ON ts.bar=b.bar
     LEFT JOIN glasses g
     ON ts.glass_type=g.glass
+    GROUP BY b.id, g.id
     ) S
 ON T.bar_id = S.bar_id AND T.glass_id = S.glass_id
 WHEN NOT MATCHED THEN 
@@ -109,13 +214,54 @@ WHEN NOT MATCHED THEN
     VALUES (S.bar_id, S.glass_id, S.stock)
 """
 
+# the cocktail of every drink, in the first of its glasses by name when it is served in several,
+# the only cocktail the transactions of the drink are merged with (see DimensionKeyCache)
+select_drink_cocktail = """
+    SELECT DISTINCT ON (c.drink) c.id, c.drink, c.glass_id
+    FROM cocktails c
+    INNER JOIN glasses g ON g.id = c.glass_id
+    ORDER BY c.drink, g.glass COLLATE "C"
+"""
+
 insert_transaction_table = """
 MERGE INTO fact_transactions H
 USING (
-    SELECT b.id AS bar_id, c.id AS cocktail_id, amount, tx.time
+    SELECT DISTINCT b.id AS bar_id, c.id AS cocktail_id, amount, tx.time
+    FROM {temp_table} tx
+    INNER JOIN bars b ON tx.location=b.bar
+    INNER JOIN (""" + select_drink_cocktail + """) c ON tx.drink=c.drink
+    ) S
+ON H.bar_id = S.bar_id AND H.cocktail_id = S.cocktail_id AND H.date = S.time
+WHEN NOT MATCHED THEN 
+    INSERT (bar_id, cocktail_id, amount, date) 
+    VALUES (S.bar_id, S.cocktail_id, S.amount, S.time)
+"""
+
+is_partitioned = """
+SELECT EXISTS (
+    SELECT 1 FROM pg_partitioned_table p
+    JOIN pg_class c ON c.oid = p.partrelid
+    WHERE c.relname = :table_name
+)
+"""
+
+select_staged_months = """
+SELECT DISTINCT date_trunc('month', time) FROM {temp_table} ORDER BY 1
+"""
+
+create_month_partition = """
+CREATE TABLE IF NOT EXISTS "{partition}" PARTITION OF {table_name}
+FOR VALUES FROM ('{start}') TO ('{end}')
+"""
+
+insert_transaction_partition = """
+MERGE INTO "{partition}" H
+USING (
+    SELECT DISTINCT b.id AS bar_id, c.id AS cocktail_id, amount, tx.time
     FROM {temp_table} tx
     INNER JOIN bars b ON tx.location=b.bar
-    INNER JOIN cocktails c ON tx.drink=c.drink
+    INNER JOIN (""" + select_drink_cocktail + """) c ON tx.drink=c.drink
+    WHERE tx.time >= :start AND tx.time < :end
     ) S
 ON H.bar_id = S.bar_id AND H.cocktail_id = S.cocktail_id AND H.date = S.time
 WHEN NOT MATCHED THEN 
@@ -123,6 +269,146 @@ WHEN NOT MATCHED THEN
     VALUES (S.bar_id, S.cocktail_id, S.amount, S.time)
 """
 
+append_transaction_table = """
+INSERT INTO fact_transactions (bar_id, cocktail_id, amount, date)
+SELECT DISTINCT tx.bar_id, tx.cocktail_id, tx.amount, tx.time
+FROM {temp_table} tx
+WHERE NOT EXISTS (
+    SELECT 1 FROM fact_transactions H
+    WHERE H.bar_id = tx.bar_id AND H.cocktail_id = tx.cocktail_id AND H.date = tx.time
+)
+"""
+
+append_transaction_partition = """
+INSERT INTO "{partition}" (bar_id, cocktail_id, amount, date)
+SELECT DISTINCT tx.bar_id, tx.cocktail_id, tx.amount, tx.time
+FROM {temp_table} tx
+WHERE tx.time >= :start AND tx.time < :end
+AND NOT EXISTS (
+    SELECT 1 FROM "{partition}" H
+    WHERE H.bar_id = tx.bar_id AND H.cocktail_id = tx.cocktail_id AND H.date = tx.time
+)
+"""
+
+select_last_transaction_id = """
+SELECT COALESCE(MAX(id), 0) FROM fact_transactions
+"""
+
+select_rollup_watermark = """
+SELECT last_id FROM etl_rollup_watermarks WHERE rollup = :rollup
+"""
+
+upsert_rollup_watermark = """
+INSERT INTO etl_rollup_watermarks (rollup, last_id, updated_at)
+VALUES (:rollup, :last_id, now())
+ON CONFLICT (rollup) DO UPDATE SET last_id = EXCLUDED.last_id, updated_at = EXCLUDED.updated_at
+"""
+
+# rollups of the fact_transactions rows with an id in (:last_id, :max_id], added to the existing totals
+update_sales_bar_cocktail_hourly = """
+INSERT INTO sales_bar_cocktail_hourly AS T (bar_id, cocktail_id, hour, sales, amount)
+SELECT bar_id, cocktail_id, date_trunc('hour', date), COUNT(*), SUM(amount)
+FROM fact_transactions
+WHERE id > :last_id AND id <= :max_id
+GROUP BY 1, 2, 3
+ON CONFLICT (bar_id, cocktail_id, hour) DO UPDATE
+SET sales = T.sales + EXCLUDED.sales, amount = T.amount + EXCLUDED.amount
+"""
+
+update_sales_bar_glass_daily = """
+INSERT INTO sales_bar_glass_daily AS T (bar_id, glass_id, day, sales, amount)
+SELECT f.bar_id, c.glass_id, date_trunc('day', f.date), COUNT(*), SUM(f.amount)
+FROM fact_transactions f
+INNER JOIN cocktails c ON c.id = f.cocktail_id
+WHERE f.id > :last_id AND f.id <= :max_id
+GROUP BY 1, 2, 3
+ON CONFLICT (bar_id, glass_id, day) DO UPDATE
+SET sales = T.sales + EXCLUDED.sales, amount = T.amount + EXCLUDED.amount
+"""
+
+# hourly glass demand of every bar over the hours it sold a drink, zero when a glass was not used,
+# against its stock, see utils.analytics.glass_demand
+select_glass_demand = """
+WITH hourly AS (
+    SELECT f.bar_id, c.glass_id, date_trunc('hour', f.date) AS hour, COUNT(*) AS demand
+    FROM fact_transactions f
+    INNER JOIN cocktails c ON c.id = f.cocktail_id
+    WHERE (CAST(:start AS timestamp) IS NULL OR f.date >= :start)
+    AND (CAST(:end AS timestamp) IS NULL OR f.date < :end)
+    GROUP BY 1, 2, 3
+),
+bar_hours AS (
+    SELECT DISTINCT bar_id, hour FROM hourly
+),
+bar_glasses AS (
+    SELECT bar_id, glass_id FROM hourly
+    UNION
+    SELECT bar_id, glass_id FROM bar_stock
+),
+demand AS (
+    SELECT bg.bar_id, bg.glass_id, COALESCE(h.demand, 0) AS demand
+    FROM bar_glasses bg
+    INNER JOIN bar_hours bh ON bh.bar_id = bg.bar_id
+    LEFT JOIN hourly h ON h.bar_id = bg.bar_id AND h.glass_id = bg.glass_id AND h.hour = bh.hour
+),
+stats AS (
+    SELECT
+        bar_id,
+        glass_id,
+        MAX(demand) AS peak_hourly_demand,
+        percentile_cont(CAST(:percentile AS float)) WITHIN GROUP (ORDER BY demand) AS percentile_demand,
+        AVG(demand) AS mean_hourly_demand
+    FROM demand
+    GROUP BY 1, 2
+)
+SELECT
+    b.bar,
+    g.glass,
+    s.peak_hourly_demand,
+    s.percentile_demand,
+    s.mean_hourly_demand,
+    COALESCE(st.stock, 0) AS stock,
+    GREATEST(s.peak_hourly_demand - COALESCE(st.stock, 0), 0) AS shortfall,
+    GREATEST(CEIL(s.percentile_demand) - COALESCE(st.stock, 0), 0)::bigint AS percentile_shortfall
+FROM stats s
+INNER JOIN bars b ON b.id = s.bar_id
+INNER JOIN glasses g ON g.id = s.glass_id
+LEFT JOIN bar_stock st ON st.bar_id = s.bar_id AND st.glass_id = s.glass_id
+ORDER BY b.bar, g.glass
+"""
+
+select_date_range = """
+SELECT MIN(date_id), MAX(date_id) FROM {date_table}
+"""
+
+insert_date_dim = """
+INSERT INTO {date_table} (date_id, date, calendar_day, hour, week_number, month, quarter, year, day_name)
+SELECT
+    to_char(d, 'YYYY-MM-DD"T"HH24:MI:SS'),
+    date_trunc('day', d),
+    EXTRACT(DAY FROM d)::int,
+    EXTRACT(HOUR FROM d)::int,
+    EXTRACT(WEEK FROM d)::int,
+    trim(to_char(d, 'Month')),
+    EXTRACT(QUARTER FROM d)::int,
+    EXTRACT(YEAR FROM d)::int,
+    trim(to_char(d, 'Day'))
+FROM generate_series(CAST(:start AS timestamp), CAST(:end AS timestamp), CAST(:step AS interval)) AS d
+"""
+
+def add_unique_constraints(connection) -> None:
+    """Add the unique constraints of the models that tables created by an earlier version are missing."""
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name not in existing:
+                print(f"Adding {constraint.name}")
+                connection.execute(AddConstraint(constraint))
+
+
 if __name__ == "__main__":
     db_user = os.environ["PG_USER"]
     db_password = os.environ["PG_PASSWORD"]
@@ -135,6 +421,12 @@ if __name__ == "__main__":
         f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
     )
     Base.metadata.create_all(engine, checkfirst=True)
+    # add the indexes introduced after the tables were first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        add_unique_constraints(connection)
     Session = sessionmaker(bind=engine)
     session = Session()
     session.commit()
@@ -0,0 +1,147 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from typing import Dict, Optional, Any as AnyType
+import pandas as pd
+from utils.state import file_fingerprint
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # the staging cache is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMATS = ("parquet", "arrow")
+PARTITIONS = {"day": "D", "month": "M"}
+PARTITION_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+MANIFEST = "_manifest.json"
+
+
+def source_key(parameters: Dict) -> Optional[str]:
+    """
+    Return the cache key of a CSV source: a hash of its file content and of its
+    parameters, so the cached data is dropped when either changes. Sources that
+    are not read from a file have no key and are not cached.
+    """
+    path = parameters.get("pandas_kwargs", {}).get("filepath_or_buffer")
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(parameters, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(file_fingerprint(path).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StagingCache:
+    """
+    Columnar cache of the validated data of every CSV source, written after
+    extract_and_validate and read instead of parsing and validating the file
+    again while the file and the source parameters are unchanged. The data of a
+    source is stored in <directory>/<source>/ and partitioned by the month or
+    day of its time column, as Parquet files or memory-mapped Arrow IPC files.
+
+    parameters
+    ----------
+    directory : str
+        Directory holding the cached sources.
+
+    format : str
+        "parquet" (default) for compressed files, "arrow" for uncompressed Arrow IPC
+        files read memory-mapped without copying.
+
+    partition_by : str
+        "month" (default) or "day", granularity of the time partitions.
+
+    time_column : str
+        Column the partitions are computed from, sources without it are stored in a
+        single file.
+    """
+
+    def __init__(  # pylint: disable=redefined-builtin
+        self, directory: str, format: str = "parquet", partition_by: str = "month", time_column: str = "time"
+    ) -> None:
+        if pa is None:
+            raise ImportError("The staging cache requires pyarrow, install it with pip install pyarrow")
+        if format not in CACHE_FORMATS:
+            raise ValueError(f"Unknown staging cache format {format!r}, expected one of {CACHE_FORMATS}")
+        if partition_by not in PARTITIONS:
+            raise ValueError(f"Unknown partition {partition_by!r}, expected one of {sorted(PARTITIONS)}")
+        self.directory = directory
+        self.format = format
+        self.partition_by = partition_by
+        self.time_column = time_column
+
+    def _source_dir(self, name: str) -> str:
+        return os.path.join(self.directory, name.replace(os.sep, "_"))
+
+    def _manifest(self, name: str) -> Optional[Dict[str, AnyType]]:
+        try:
+            with open(os.path.join(self._source_dir(name), MANIFEST), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, name: str, key: str) -> Optional[pd.DataFrame]:
+        """Return the cached data of a source, None when it is not cached with the same key."""
+        manifest = self._manifest(name)
+        if manifest is None or manifest["key"] != key or manifest["format"] != self.format:
+            return None
+        source_dir = self._source_dir(name)
+        tables = []
+        for partition in manifest["partitions"]:
+            path = os.path.join(source_dir, partition)
+            if self.format == "arrow":
+                tables.append(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+            else:
+                tables.append(pq.read_table(path, memory_map=True))
+        if not tables:
+            return None
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        logger.info("Read %s rows of %s from the staging cache", table.num_rows, name)
+        return table.to_pandas()
+
+    def write(self, name: str, key: str, df: pd.DataFrame) -> int:
+        """Replace the cached data of a source and return the number of bytes written."""
+        source_dir = self._source_dir(name)
+        tmp_dir = f"{source_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.time_column in df.columns and not df.empty:
+            # the partition names are only formatted once per distinct period
+            times = df[self.time_column]
+            if isinstance(times.dtype, pd.ArrowDtype):
+                times = times.astype("datetime64[ns]")
+            periods = times.dt.to_period(PARTITIONS[self.partition_by])
+            codes, uniques = pd.factorize(periods)
+            labels = uniques.strftime(PARTITION_FORMATS[self.partition_by])
+            positions_by_code = pd.Series(codes).groupby(codes).indices
+            groups = {labels[code]: positions for code, positions in positions_by_code.items()}
+        else:
+            groups = {None: None}
+        partitions = []
+        for period, positions in sorted(groups.items(), key=lambda item: item[0] or ""):
+            part = table if positions is None else table.take(positions)
+            partition = f"{self.partition_by}={period}.{self.format}" if period else f"all.{self.format}"
+            path = os.path.join(tmp_dir, partition)
+            if self.format == "arrow":
+                with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, part.schema) as writer:
+                    writer.write_table(part)
+            else:
+                pq.write_table(part, path, compression="zstd")
+            partitions.append(partition)
+
+        manifest = {"key": key, "format": self.format, "rows": len(df), "partitions": partitions}
+        with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        shutil.rmtree(source_dir, ignore_errors=True)
+        os.replace(tmp_dir, source_dir)
+        written = sum(os.path.getsize(os.path.join(source_dir, partition)) for partition in partitions)
+        logger.info("Wrote %s rows of %s to the staging cache in %s partitions", len(df), name, len(partitions))
+        return written
@@ -0,0 +1,143 @@
+import os
+import hashlib
+import logging
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Any as AnyType
+import pandas as pd
+from sqlalchemy import select
+from utils.sql import SourceState
+
+logger = logging.getLogger(__name__)
+
+
+def file_fingerprint(path: str, block_size: int = 1024 * 1024) -> str:
+    """Return a hash of the content of the file at path."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Return a hash of the columns and values of a DataFrame, ignoring its index."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class SourceStateStore:
+    """
+    Keeps the per source state of the pipeline (high-water mark of the loaded
+    data, size and modification time of the source file, content fingerprint
+    and the duration of its last run) in the etl_source_state table. Updates
+    are staged in memory and only written by save, once the loaded data has
+    been merged into the report tables.
+
+    parameters
+    ----------
+    connection : sqlalchemy.engine.Connection
+        Connection to the database holding the state table.
+    """
+
+    table = SourceState.__table__
+
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self.table.create(connection, checkfirst=True)
+        self.states: Dict[str, Dict[str, AnyType]] = {
+            row.source: dict(row._mapping) for row in connection.execute(select(self.table))
+        }
+        self.pending: Dict[str, Dict[str, AnyType]] = {}
+        self.skipped: List[str] = []
+        self._lock = threading.RLock()  # stages update the state from concurrent tasks
+
+    def get(self, source: str) -> Dict[str, AnyType]:
+        """Return the pending or last saved state of source."""
+        with self._lock:
+            return {**self.states.get(source, {}), **self.pending.get(source, {})}
+
+    def watermark(self, source: str) -> Optional[pd.Timestamp]:
+        """Return the latest loaded timestamp of source, if any."""
+        watermark = self.states.get(source, {}).get("watermark")
+        return None if watermark is None else pd.Timestamp(watermark)
+
+    def file_size(self, source: str) -> Optional[int]:
+        """Return the size of the file of source when it was last loaded, if any."""
+        return self.states.get(source, {}).get("file_size")
+
+    def file_changed(self, source: str, path: str) -> bool:
+        """
+        Check if the file of source changed since the last saved run and stage
+        its current size and modification time.
+        """
+        stat = os.stat(path)
+        saved = self.states.get(source, {})
+        changed = saved.get("file_size") != stat.st_size or saved.get("file_mtime") != stat.st_mtime
+        self.update(source, file_size=stat.st_size, file_mtime=stat.st_mtime)
+        return changed
+
+    def advance_watermark(self, source: str, df: pd.DataFrame, column: str = "time") -> None:
+        """Move the pending watermark of source up to the latest value of column in df."""
+        if df.empty:
+            return
+        latest = df[column].max()
+        with self._lock:
+            current = self.get(source).get("watermark")
+            if current is None or latest > pd.Timestamp(current):
+                self.update(source, watermark=pd.Timestamp(latest).to_pydatetime())
+
+    def unchanged(self, source: str, fingerprint: str) -> bool:
+        """
+        Check if the fingerprint of source matches the last saved run, stage the
+        new fingerprint and mark the source as skipped when it is unchanged.
+        """
+        unchanged = self.states.get(source, {}).get("fingerprint") == fingerprint
+        self.update(source, fingerprint=fingerprint)
+        if unchanged:
+            self.skip(source)
+        return unchanged
+
+    def skip(self, source: str) -> None:
+        """Mark a stage as skipped in this run, keeping the duration of its last run."""
+        with self._lock:
+            self.skipped.append(source)
+        logger.info("Skipping unchanged %s", source)
+
+    def report(self) -> Dict[str, AnyType]:
+        """Log and return the stages skipped in this run and the estimated time saved."""
+        saved = sum(self.states.get(source, {}).get("duration") or 0.0 for source in self.skipped)
+        if self.skipped:
+            logger.info(
+                "Skipped %s unchanged stages (%s), saving about %.2f seconds",
+                len(self.skipped),
+                ", ".join(self.skipped),
+                saved,
+            )
+        return {"skipped": list(self.skipped), "seconds_saved": saved}
+
+    def update(self, source: str, **values: AnyType) -> None:
+        """Stage new state values for source."""
+        with self._lock:
+            self.pending.setdefault(source, {}).update(values)
+
+    def save(self) -> None:
+        """Write the staged state of every source to the state table."""
+        if not self.pending:
+            return
+        rows = []
+        for source in self.pending:
+            row = {column.name: None for column in self.table.columns}
+            row.update(self.get(source), source=source, updated_at=datetime.utcnow())
+            rows.append(row)
+        transaction = nullcontext() if self.connection.in_transaction() else self.connection.begin()
+        with transaction:
+            self.connection.execute(self.table.delete().where(self.table.c.source.in_(list(self.pending))))
+            self.connection.execute(self.table.insert(), rows)
+        for row in rows:
+            self.states[row["source"]] = row
+        self.pending = {}
+        logger.info("Saved pipeline state for %s", ", ".join(row["source"] for row in rows))
@@ -0,0 +1,194 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pandera as pa
+from pandera.engines import pandas_engine
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_MODES = ("pandera", "fast", "sample")
+
+
+# Vectorized equivalents of the pandera built-in checks, called with the check statistics.
+BUILTIN_CHECKS: Dict[str, Callable[..., pd.Series]] = {
+    "equal_to": lambda series, value: series == value,
+    "not_equal_to": lambda series, value: series != value,
+    "greater_than": lambda series, min_value: series > min_value,
+    "greater_than_or_equal_to": lambda series, min_value: series >= min_value,
+    "less_than": lambda series, max_value: series < max_value,
+    "less_than_or_equal_to": lambda series, max_value: series <= max_value,
+    "in_range": lambda series, min_value, max_value, include_min=True, include_max=True: (
+        (series >= min_value if include_min else series > min_value)
+        & (series <= max_value if include_max else series < max_value)
+    ),
+    "isin": lambda series, allowed_values: series.isin(allowed_values),
+    "notin": lambda series, forbidden_values: ~series.isin(forbidden_values),
+}
+
+
+class CompiledSchema:
+    """
+    Vectorized pre-checks compiled from the columns of a pandera DataFrameSchema: the
+    presence, dtype and nullability of every column and its built-in and custom checks.
+    Schemas using features the pre-checks do not cover (coercion, regex columns,
+    uniqueness, dataframe or index checks) are not supported and are validated with
+    pandera.
+
+    parameters
+    ----------
+    schema : pa.DataFrameSchema
+        Schema the pre-checks are compiled from.
+    """
+
+    def __init__(self, schema: pa.DataFrameSchema) -> None:
+        self.schema = schema
+        self.columns: List[Tuple[str, pa.Column, List[Tuple[pa.Check, Callable]]]] = []
+        self.supported = not (
+            schema.coerce or schema.strict or schema.unique or schema.checks or schema.index is not None
+        )
+        for name, column in schema.columns.items():
+            if column.coerce or column.regex or column.unique:
+                self.supported = False
+            checks = []
+            for check in column.checks:
+                if check.name in BUILTIN_CHECKS:
+                    checks.append((check, BUILTIN_CHECKS[check.name]))
+                elif not check.statistics:
+                    checks.append((check, check._check_fn))  # pylint: disable=protected-access
+                else:
+                    self.supported = False
+            self.columns.append((name, column, checks))
+
+    def frame_errors(self, df: pd.DataFrame) -> bool:
+        """Return True when a column is missing or fails a check applying to the whole column (e.g. its dtype)."""
+        for name, column, checks in self.columns:
+            if name not in df.columns:
+                if column.required:
+                    return True
+                continue
+            series = df[name]
+            if column.dtype is not None and not column.dtype.check(pandas_engine.Engine.dtype(series.dtype)):
+                return True
+            for check, func in checks:
+                # the built-in checks are always row level
+                if not check.element_wise and check.name not in BUILTIN_CHECKS:
+                    result = func(series)
+                    if isinstance(result, (bool, np.bool_)) and not result:
+                        return True
+        return False
+
+    def row_mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Return a boolean array flagging the rows of df failing a row level check."""
+        failed = np.zeros(len(df), dtype=bool)
+        for name, column, checks in self.columns:
+            if name not in df.columns:
+                continue
+            series = df[name]
+            isna = series.isna().to_numpy()
+            if not column.nullable:
+                failed |= isna
+            for check, func in checks:
+                if check.element_wise:
+                    result = series.map(func)
+                else:
+                    result = func(series, **check.statistics)
+                    if isinstance(result, (bool, np.bool_)):
+                        continue  # column level result, see frame_errors
+                passed = np.asarray(result, dtype=bool)
+                if check.ignore_na:
+                    passed = passed | isna
+                failed |= ~passed
+        return failed
+
+
+_compiled_schemas: Dict[int, CompiledSchema] = {}
+
+
+def compile_schema(schema: pa.DataFrameSchema) -> CompiledSchema:
+    """Return the pre-checks compiled from schema, compiling them on first use."""
+    compiled = _compiled_schemas.get(id(schema))
+    if compiled is None or compiled.schema is not schema:
+        compiled = _compiled_schemas[id(schema)] = CompiledSchema(schema)
+    return compiled
+
+
+def failing_rows(df: pd.DataFrame, compiled: CompiledSchema, chunk_rows: int = 1_000_000) -> pd.Index:
+    """Return the index labels of the rows of df failing a pre-check, checking chunk_rows rows at a time."""
+    failed = []
+    for start in range(0, len(df), max(chunk_rows, 1)):
+        chunk = df.iloc[start:start + chunk_rows]
+        mask = compiled.row_mask(chunk)
+        if mask.any():
+            failed.append(chunk.index[mask])
+    return failed[0].append(failed[1:]) if failed else df.index[:0]
+
+
+def validate_frame(
+    df: pd.DataFrame,
+    schema: pa.DataFrameSchema,
+    mode: str = "pandera",
+    sample_size: int = 10_000,
+    chunk_rows: int = 1_000_000,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Validates df with the schema and returns it, raising a pandera SchemaErrors when it
+    does not conform to the schema.
+
+    parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame to validate. Its index holds the source row numbers reported in the
+        failure cases.
+
+    schema : pa.DataFrameSchema
+        This is the pandera DataFrameSchema object.
+
+    mode : str
+        "pandera" validates every row with pandera (default). "fast" runs the vectorized
+        pre-checks compiled from the schema chunk_rows rows at a time and only hands the
+        failing rows to pandera to build the failure cases. "sample" validates a random
+        sample of sample_size rows with pandera, for trusted sources.
+
+    sample_size : int
+        Number of rows validated in sample mode.
+
+    chunk_rows : int
+        Number of rows pre-checked at a time in fast mode.
+
+    seed : Optional[int]
+        Seed of the rows sampled in sample mode. By default a new seed is drawn, so
+        every run checks other rows, and logged to reproduce a failed sample.
+
+    Returns
+    -------
+    df: pd.DataFrame
+        The validated DataFrame.
+    """
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode {mode!r}, expected one of {VALIDATION_MODES}")
+    if mode == "sample" and len(df) > sample_size:
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        logger.info("Validating a sample of %s of %s rows with seed %s", sample_size, len(df), seed)
+        # sampling with replacement avoids permuting the whole frame
+        positions = np.unique(np.random.default_rng(seed).integers(0, len(df), sample_size))
+        schema.validate(df.iloc[positions], lazy=True)
+        return df
+    compiled = compile_schema(schema) if mode == "fast" else None
+    if compiled is None or not compiled.supported or compiled.frame_errors(df):
+        return schema.validate(df, lazy=True)
+    failed = failing_rows(df, compiled, chunk_rows)
+    if len(failed):
+        schema.validate(df.loc[failed], lazy=True)
+        logger.warning("Pre-checks flagged %s rows that pandera accepted", len(failed))
+    return df
+
+
+def validation_options(parameters: Dict) -> Tuple[Dict, Optional[Dict]]:
+    """Split the validation options from the extractor parameters of a source."""
+    if "validation" not in parameters:
+        return parameters, None
+    parameters = dict(parameters)
+    return parameters, parameters.pop("validation")